@@ -28,6 +28,7 @@ class TestConfig:
         assert config.make_www is False
         assert config.keep_redirections is False
         assert config.output_dir == "./output"
+        assert config.verbose is True
 
     def test_env_variables(self):
         """Test environment variable parsing."""
@@ -101,12 +101,12 @@ class TestDownloadFileFallbacks:
             elif attempt <= 3:
                 # Variant attempts return corrupted font (HTML error page)
                 resp.status_code = 200
-                resp.content = b'<!DOCTYPE html><html>Error</html>'
+                resp.raw.read = Mock(return_value=b'<!DOCTYPE html><html>Error</html>')
                 resp.raise_for_status = Mock()
             else:
                 # Eventually get real font
                 resp.status_code = 200
-                resp.content = b'\x00\x01\x00\x00' + b'\x00' * 50
+                resp.raw.read = Mock(side_effect=[b'\x00\x01\x00\x00', b'\x00' * 50])
                 resp.raise_for_status = Mock()
             return resp
 
@@ -676,6 +676,104 @@ class TestDownloadLoopDeep:
         dl._process_html = fake_process_html
         dl.download()
 
+    def test_download_queue_dedup_across_pages(self, tmp_path):
+        """A link queued by one page is not queued again by the next."""
+        dl = _make_dl()
+        dl.config.output_dir = str(tmp_path)
+        downloaded = []
+        def fake_download_file(url):
+            downloaded.append(url)
+            return b'<html><body>Page</body></html>'
+
+        dl.download_file = fake_download_file
+        links = {
+            "http://example.com/": ["http://example.com/a", "http://example.com/b"],
+            "http://example.com/a": ["http://example.com/b?ref=a", "http://example.com/b#top"],
+        }
+        dl._process_html = lambda html, base_url: ("<html>Page</html>", links.get(base_url, []))
+        dl.download()
+        # Queued files are fetched concurrently, so compare without order
+        assert sorted(downloaded) == ["http://example.com/", "http://example.com/a", "http://example.com/b"]
+
+    def test_download_quiet_skips_per_file_lines(self, tmp_path, capsys):
+        """With VERBOSE off only the banner, errors and summary are printed."""
+        dl = _make_dl()
+        dl.config.output_dir = str(tmp_path)
+        dl.config.verbose = False
+        dl.download_file = Mock(return_value=b'<html><body>Page</body></html>')
+        dl._process_html = Mock(return_value=("<html>Page</html>", []))
+        with patch("wayback_archive.downloader.tqdm") as tqdm:
+            dl.download()
+        out = capsys.readouterr().out
+        assert "Downloading" not in out
+        assert "Files successfully downloaded: 1" in out
+        tqdm.return_value.update.assert_called_once_with()
+        tqdm.return_value.close.assert_called_once_with()
+
+    def test_download_prefetch_respects_max_files(self, tmp_path):
+        """Files are not fetched ahead past the MAX_FILES limit."""
+        dl = _make_dl()
+        dl.config.output_dir = str(tmp_path)
+        dl.config.max_files = 2
+        dl.download_file = Mock(return_value=b'<html><body>Page</body></html>')
+        pages = [f"http://example.com/p{i}" for i in range(5)]
+        dl._process_html = lambda html, base_url: ("<html>Page</html>", pages)
+        dl.download()
+        assert dl.download_file.call_count == 2
+
+    def test_download_prefetches_queued_files(self, tmp_path):
+        """Later queue entries are downloaded in worker threads."""
+        import threading
+        dl = _make_dl()
+        dl.config.output_dir = str(tmp_path)
+        threads = {}
+        def fake_download_file(url):
+            threads[url] = threading.current_thread()
+            return b'<html><body>Page</body></html>'
+
+        dl.download_file = fake_download_file
+        pages = [f"http://example.com/p{i}" for i in range(3)]
+        dl._process_html = lambda html, base_url: ("<html>Page</html>", pages if base_url == "http://example.com/" else [])
+        dl.download()
+        assert set(threads) == {"http://example.com/", *pages}
+        assert all(threads[p] is not threading.main_thread() for p in pages)
+        assert dl._download_pool is None
+
+    def test_prefetch_hands_output_to_main_thread(self, tmp_path, capsys):
+        """Prefetch threads neither print nor touch corrupted_fonts themselves."""
+        import threading
+        dl = _make_dl()
+        dl.config.output_dir = str(tmp_path)
+        seen = {}
+        def fake_download_file(url):
+            if url.endswith(".woff"):
+                dl._log("         fetched in background")
+                dl._mark_corrupted_font(url)
+                seen["fonts"] = set(dl.corrupted_fonts)
+                return None
+            return b'<html><body>Page</body></html>'
+
+        dl.download_file = fake_download_file
+        font = "http://example.com/font.woff"
+        dl._process_html = lambda html, base_url: ("<html>Page</html>", [font] if base_url == "http://example.com/" else [])
+        printing_threads = set()
+        def recording_print(*args, **kwargs):
+            printing_threads.add(threading.current_thread())
+            print(*args, **kwargs)
+
+        with patch("wayback_archive.downloader.print", recording_print, create=True):
+            dl.download()
+        assert seen["fonts"] == set()
+        assert dl.corrupted_fonts == {font}
+        assert printing_threads == {threading.main_thread()}
+        out = capsys.readouterr().out
+        assert out.index("Downloading Font") < out.index("fetched in background") < out.index("Font file is corrupted")
+
+    def test_session_pool_fits_worker_threads(self):
+        dl = _make_dl()
+        adapter = dl.session.get_adapter("https://web.archive.org/")
+        assert adapter._pool_maxsize == 2 * dl.MAX_WORKERS
+
     def test_download_css_with_queue_dedup(self, tmp_path):
         """CSS resource URLs should be deduplicated in queue."""
         dl = _make_dl()
@@ -853,7 +951,7 @@ class TestCheckCorruptedFontsAbsPath:
         """Font with path relative to CSS file should be resolved correctly."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = b'\x00\x01\x00\x00' + b'\x00' * 200
+        mock_response.raw.read = Mock(return_value=b'\x00\x01\x00\x00' + b'\x00' * 200)
         self.dl.session.get = Mock(return_value=mock_response)
 
         css = "@font-face { src: url('fonts/regular.woff'); }"
@@ -1147,6 +1245,31 @@ class TestImageOptimization:
         result = self.dl._optimize_image(content, "PNG")
         assert len(result) > 0
 
+    def test_optimize_png_with_libvips_drops_alpha(self):
+        """PNGs go through libvips when available, matching Pillow's RGB output."""
+        from wayback_archive import downloader
+        if downloader.pyvips is None:
+            pytest.skip("pyvips/libvips not available")
+        from PIL import Image
+        from io import BytesIO
+        img = Image.new("RGBA", (10, 10), (255, 0, 0, 128))
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        result = self.dl._optimize_image(buf.getvalue(), "PNG")
+        out = Image.open(BytesIO(result))
+        assert out.format == "PNG"
+        assert out.mode == "RGB"
+
+    def test_optimize_png_without_libvips_uses_pillow(self):
+        from PIL import Image
+        from io import BytesIO
+        img = Image.new("RGBA", (10, 10), (255, 0, 0, 128))
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        with patch("wayback_archive.downloader.pyvips", None):
+            result = self.dl._optimize_image(buf.getvalue(), "PNG")
+        assert Image.open(BytesIO(result)).mode == "RGB"
+
 
 class TestJsUrlExtraction:
     """Cover lines 1016-1024: JS URL extraction filtering."""
@@ -51,7 +51,7 @@ class TestWaybackDownloader:
 
     def test_convert_to_wayback_url(self):
         """Test Wayback URL conversion."""
-        wayback_url = self.downloader._convert_to_wayback_url("http://example.com/page")
+        wayback_url = self.downloader._convert_to_wayback_url_with_timestamp("http://example.com/page")
         assert "web.archive.org" in wayback_url
         assert "20250417203037" in wayback_url
 
@@ -75,6 +75,13 @@ class TestParseWaybackUrl:
         with pytest.raises(ValueError, match="Invalid Wayback URL"):
             WaybackDownloader(config)
 
+    def test_non_numeric_timestamp_raises(self):
+        """Timestamps must start with digits."""
+        os.environ["WAYBACK_URL"] = "https://web.archive.org/web/latest/http://example.com/"
+        config = Config()
+        with pytest.raises(ValueError, match="Invalid Wayback URL"):
+            WaybackDownloader(config)
+
     def test_unparseable_timestamp_fallback(self):
         """If timestamp can't be parsed, falls back to current time."""
         # This uses a timestamp that will fail datetime parsing via the regex path
@@ -106,6 +113,11 @@ class TestIsInternalUrl:
     def test_external_domain(self):
         assert self.dl._is_internal_url("http://other.com/page") is False
 
+    def test_only_www_label_is_ignored(self):
+        dl = _make_downloader("https://web.archive.org/web/20250417203037/http://wwwise.com/")
+        assert dl._is_internal_url("http://www.wwwise.com/page") is True
+        assert dl._is_internal_url("http://ise.com/page") is False
+
     def test_tel_scheme(self):
         assert self.dl._is_internal_url("tel:+123") is False
 
@@ -137,6 +149,13 @@ class TestIsInternalUrl:
     def test_file_scheme(self):
         assert self.dl._is_internal_url("file:///tmp/test") is False
 
+    def test_refresh_config_picks_up_domain_change(self):
+        self.dl.config.domain = "other.com"
+        assert self.dl._is_internal_url("http://other.com/page") is False
+        self.dl.refresh_config()
+        assert self.dl._is_internal_url("http://other.com/page") is True
+        assert self.dl._is_internal_url("http://example.com/page") is False
+
 
 # ===================================================================
 # _is_squarespace_cdn
@@ -190,6 +209,21 @@ class TestPatternDetection:
         assert self.dl._is_ad("https://example.com/popup-ad.html") is True
         assert self.dl._is_ad("https://example.com/content.html") is False
 
+    def test_regex_fallback_without_automaton(self):
+        self.dl._tracker_ac = None
+        self.dl._ad_ac = None
+        assert self.dl._is_tracker("https://WWW.Google-Analytics.com/ga.js") is True
+        assert self.dl._is_tracker("https://example.com/normal.js") is False
+        assert self.dl._is_ad("https://ADS.example.com/x.js") is True
+        assert self.dl._is_ad("https://example.com/content.html") is False
+
+    def test_automaton_matches_case_insensitively(self):
+        pytest.importorskip("ahocorasick")
+        assert self.dl._tracker_ac is not None
+        assert self.dl._is_tracker("https://WWW.Google-Analytics.com/ga.js") is True
+        assert self.dl._is_tracker("https://example.com/gaXjs") is False
+        assert self.dl._is_ad("https://example.com/Sponsor.png") is True
+
     def test_contact_patterns(self):
         assert self.dl._is_contact_link("mailto:user@example.com") is True
         assert self.dl._is_contact_link("tel:+34600000000") is True
@@ -244,9 +278,16 @@ class TestConvertToWaybackUrl:
         result = self.dl._convert_to_wayback_url_with_timestamp("http://example.com/page", use_iframe=True)
         assert "if_" in result
 
-    def test_backward_compat_wrapper(self):
-        result = self.dl._convert_to_wayback_url("http://example.com/page.png")
-        assert "im_" in result
+    def test_prefix_uses_final_extension_only(self):
+        """Extensions are matched exactly, so .json is not mistaken for .js."""
+        result = self.dl._convert_to_wayback_url_with_timestamp("http://example.com/data.json")
+        assert result == "https://web.archive.org/web/20250417203037/http://example.com/data.json"
+        result = self.dl._convert_to_wayback_url_with_timestamp("http://example.com/IMG.PNG")
+        assert "20250417203037im_/" in result
+
+    def test_prefix_for_es_module(self):
+        result = self.dl._convert_to_wayback_url_with_timestamp("http://example.com/app.mjs")
+        assert "20250417203037js_/" in result
 
     def test_various_image_extensions(self):
         for ext in [".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".bmp"]:
@@ -340,6 +381,13 @@ class TestNormalizeUrl:
         result = self.dl._normalize_url("http://example.com/page", "http://example.com/")
         assert "www." in result
 
+    def test_www_setting_change_not_served_from_cache(self):
+        self.dl.config.make_non_www = False
+        self.dl.config.make_www = True
+        assert self.dl._normalize_url("http://example.com/p", "http://example.com/") == "http://www.example.com/p"
+        self.dl.config.make_www = False
+        assert self.dl._normalize_url("http://example.com/p", "http://example.com/") == "http://example.com/p"
+
     def test_protocol_relative(self):
         result = self.dl._normalize_url("//example.com/page", "http://example.com/")
         assert result.startswith("http://")
@@ -385,6 +433,14 @@ class TestGetLocalPath:
         path = self.dl._get_local_path("http://example.com/page.html")
         assert path.name == "page.html"
 
+    def test_ensure_dir_creates_each_directory_once(self, tmp_path):
+        directory = tmp_path / "img"
+        with patch.object(Path, "mkdir", autospec=True, side_effect=Path.mkdir) as mkdir:
+            self.dl._ensure_dir(directory)
+            self.dl._ensure_dir(directory)
+        assert directory.is_dir()
+        assert mkdir.call_count == 1
+
     def test_css_file(self):
         path = self.dl._get_local_path("http://example.com/style.css")
         assert path.name == "style.css"
@@ -452,6 +508,13 @@ class TestGetRelativeLinkPath:
         result = self.dl._get_relative_link_path("http://example.com/style.css", is_page=False)
         assert result.endswith(".css")
 
+    def test_result_follows_current_page(self):
+        """Cached results must not leak between pages in different directories."""
+        self.dl._current_page_url = "http://example.com/index.html"
+        assert self.dl._get_relative_link_path("http://example.com/about", is_page=True) == "about.html"
+        self.dl._current_page_url = "http://example.com/blog/post.html"
+        assert self.dl._get_relative_link_path("http://example.com/about", is_page=True) == "../about.html"
+
     def test_google_fonts_preserves_domain(self):
         self.dl._current_page_url = "http://example.com/index.html"
         result = self.dl._get_relative_link_path("https://fonts.googleapis.com/css", is_page=False)
@@ -519,6 +582,12 @@ class TestToRelativePath:
         result = self.dl._to_relative_path("relative/path")
         assert result == "relative/path"
 
+    def test_cached_result_follows_current_page(self):
+        self.dl._current_page_url = "http://example.com/blog/post.html"
+        assert self.dl._to_relative_path("/images/pic.jpg") == "../images/pic.jpg"
+        self.dl._current_page_url = "http://example.com/index.html"
+        assert self.dl._to_relative_path("/images/pic.jpg") == "images/pic.jpg"
+
 
 # ===================================================================
 # _generate_timestamp_variants
@@ -669,14 +738,16 @@ class TestOptimizeHtml:
     def test_optimization_error_returns_original(self):
         self.dl.config.optimize_html = True
         html = "<html><body>Test</body></html>"
-        # Create a mock module that raises on minify()
-        import sys
-        fake_module = MagicMock()
-        fake_module.minify = Mock(side_effect=Exception("fail"))
-        with patch.dict(sys.modules, {"minify_html": fake_module}):
+        with patch("wayback_archive.downloader._minify_html", Mock(side_effect=Exception("fail"))):
             result = self.dl._optimize_html(html)
             assert result == html
 
+    def test_minifier_unavailable_returns_original(self):
+        self.dl.config.optimize_html = True
+        html = "<html> <body>Test</body> </html>"
+        with patch("wayback_archive.downloader._minify_html", None):
+            assert self.dl._optimize_html(html) == html
+
 
 # ===================================================================
 # _minify_js / _minify_css
@@ -703,23 +774,29 @@ class TestMinification:
     def test_js_minification_error(self):
         self.dl.config.minify_js = True
         js = "function test() { return 1; }"
-        import sys
-        fake_module = MagicMock()
-        fake_module.jsmin = Mock(side_effect=Exception("fail"))
-        with patch.dict(sys.modules, {"rjsmin": fake_module}):
+        with patch("wayback_archive.downloader._jsmin", Mock(side_effect=Exception("fail"))):
             result = self.dl._minify_js(js)
             assert result == js
 
+    def test_js_minifier_unavailable(self):
+        self.dl.config.minify_js = True
+        js = "function test() { return 1; }"
+        with patch("wayback_archive.downloader._jsmin", None):
+            assert self.dl._minify_js(js) == js
+
     def test_css_minification_error(self):
         self.dl.config.minify_css = True
         css = "body { margin: 0; }"
-        import sys
-        fake_module = MagicMock()
-        fake_module.cssmin = Mock(side_effect=Exception("fail"))
-        with patch.dict(sys.modules, {"cssmin": fake_module}):
+        with patch("wayback_archive.downloader._cssmin", Mock(side_effect=Exception("fail"))):
             result = self.dl._minify_css(css)
             assert result == css
 
+    def test_css_minifier_unavailable(self):
+        self.dl.config.minify_css = True
+        css = "body { margin: 0; }"
+        with patch("wayback_archive.downloader._cssmin", None):
+            assert self.dl._minify_css(css) == css
+
 
 # ===================================================================
 # _extract_css_urls
@@ -743,6 +820,29 @@ class TestExtractCssUrls:
         urls = self.dl._extract_css_urls(css, "http://example.com/")
         assert any("bg.jpg" in u for u in urls)
 
+    def test_uppercase_import_without_url_function(self):
+        css = '@IMPORT "http://example.com/reset.css";'
+        urls = self.dl._extract_css_urls(css, "http://example.com/")
+        assert urls == ["http://example.com/reset.css"]
+
+    def test_css_without_references(self):
+        css = "body { margin: 0; color: red; }"
+        assert self.dl._extract_css_urls(css, "http://example.com/") == []
+        assert self.dl._rewrite_css_urls(css, "http://example.com/") == css
+
+    def test_repeated_css_returns_independent_lists(self):
+        css = 'background: url("/img/tile.png")'
+        first = self.dl._extract_css_urls(css, "http://example.com/")
+        first.append("http://example.com/other.png")
+        assert self.dl._extract_css_urls(css, "http://example.com/") == ["http://example.com/img/tile.png"]
+
+    def test_www_setting_change_not_served_from_cache(self):
+        css = 'background: url("http://www.example.com/bg.jpg")'
+        self.dl.config.make_non_www = False
+        assert self.dl._extract_css_urls(css, "http://example.com/") == ["http://www.example.com/bg.jpg"]
+        self.dl.config.make_non_www = True
+        assert self.dl._extract_css_urls(css, "http://example.com/") == ["http://example.com/bg.jpg"]
+
     def test_skips_data_uris(self):
         css = 'body { background: url("data:image/png;base64,ABC"); }'
         urls = self.dl._extract_css_urls(css, "http://example.com/")
@@ -801,6 +901,18 @@ class TestRewriteCssUrls:
         result = self.dl._rewrite_css_urls(css, "https://fonts.googleapis.com/css")
         assert "fonts.gstatic.com" in result
 
+    def test_rewritten_url_not_rewritten_again(self):
+        """An internal URL rewritten to a root path must not then be treated as a Google Fonts path."""
+        self.dl._current_page_url = None
+        self.dl.config.make_internal_links_relative = True
+        css = "a { background: url(http://example.com/img/a.png); }"
+        result = self.dl._rewrite_css_urls(css, "https://fonts.googleapis.com/css")
+        assert result == "a { background: url(/img/a.png); }"
+
+    def test_relative_and_data_urls_untouched(self):
+        css = "a { background: url('img/a.png'); } b { background: url(data:image/png;base64,AA); }"
+        assert self.dl._rewrite_css_urls(css, "http://example.com/css/style.css") == css
+
 
 # ===================================================================
 # _remove_corrupted_fonts_from_css
@@ -842,6 +954,14 @@ class TestRemoveCorruptedFontsFromCss:
         result = self.dl._remove_corrupted_fonts_from_css(css)
         assert "src:;" not in result
 
+    def test_removes_format_hint_with_url(self):
+        self.dl.corrupted_fonts.add("http://example.com/fonts/a.woff")
+        self.dl.corrupted_fonts.add("http://example.com/fonts/b.ttf")
+        css = ("@font-face { src: url('good.woff2') format('woff2'), "
+               "url('/fonts/a.woff') format('woff'), url(/fonts/b.ttf) format('truetype'); }")
+        result = self.dl._remove_corrupted_fonts_from_css(css)
+        assert result == "@font-face { src: url('good.woff2') format('woff2'); }"
+
 
 # ===================================================================
 # _remove_legacy_font_formats_from_css
@@ -876,6 +996,16 @@ class TestRemoveLegacyFontFormats:
         assert "font.woff2" in result
         assert "font.ttf" in result
 
+    def test_uppercase_eot_extension_removed(self):
+        css = "@font-face { src: url('FONT.EOT'); }"
+        result = self.dl._remove_legacy_font_formats_from_css(css)
+        assert "FONT.EOT" not in result
+
+    def test_cleanup_still_runs_without_legacy_fonts(self):
+        css = "@font-face { src: url('a.woff2'), , url('b.ttf'), }"
+        result = self.dl._remove_legacy_font_formats_from_css(css)
+        assert result == "@font-face { src: url('a.woff2'), url('b.ttf')}"
+
 
 # ===================================================================
 # _check_and_remove_corrupted_fonts_in_css
@@ -893,7 +1023,7 @@ class TestCheckAndRemoveCorruptedFontsInCss:
     def test_detects_corrupted_font(self, mock_convert):
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = b'<!DOCTYPE html><html>Error</html>'
+        mock_response.raw.read = Mock(return_value=b'<!DOCTYPE html><html>Error</html>')
         self.dl.session.get = Mock(return_value=mock_response)
 
         css = "@font-face { src: url('http://example.com/font.woff'); }"
@@ -904,13 +1034,30 @@ class TestCheckAndRemoveCorruptedFontsInCss:
     def test_valid_font_not_flagged(self, mock_convert):
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = b'\x00\x01\x00\x00' + b'\x00' * 200
+        mock_response.raw.read = Mock(return_value=b'\x00\x01\x00\x00' + b'\x00' * 200)
         self.dl.session.get = Mock(return_value=mock_response)
 
         css = "@font-face { src: url('http://example.com/font.woff2'); }"
         self.dl._check_and_remove_corrupted_fonts_in_css(css, "http://example.com/")
         assert len(self.dl.corrupted_fonts) == 0
 
+    def test_duplicate_fonts_probed_once_with_range(self):
+        mock_response = Mock()
+        mock_response.status_code = 206
+        mock_response.raw.read = Mock(return_value=b'<!DOCTYPE html><html>Error</html>')
+        self.dl.session.get = Mock(return_value=mock_response)
+
+        css = (
+            "@font-face { src: url('/fonts/a.woff2') format('woff2'), url('/fonts/a.woff2'); }"
+            ".x { src: url('/fonts/a.woff2'); }"
+        )
+        self.dl._check_and_remove_corrupted_fonts_in_css(css, "http://example.com/css/style.css")
+        assert self.dl.session.get.call_count == 1
+        _, kwargs = self.dl.session.get.call_args
+        assert kwargs["headers"] == {"Range": "bytes=0-255"}
+        assert kwargs["stream"] is True
+        assert "http://example.com/fonts/a.woff2" in self.dl.corrupted_fonts
+
     def test_skips_already_corrupted(self):
         self.dl.corrupted_fonts.add("http://example.com/font.woff")
         css = "@font-face { src: url('http://example.com/font.woff'); }"
@@ -928,7 +1075,7 @@ class TestCheckAndRemoveCorruptedFontsInCss:
         """Relative font URLs should be resolved to absolute before checking."""
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.content = b'\x00\x01\x00\x00' + b'\x00' * 200
+        mock_response.raw.read = Mock(return_value=b'\x00\x01\x00\x00' + b'\x00' * 200)
         self.dl.session.get = Mock(return_value=mock_response)
 
         css = "@font-face { src: url('/fonts/regular.woff'); }"
@@ -979,6 +1126,15 @@ class TestExtractJsUrls:
         urls = self.dl._extract_js_urls(js, "http://example.com/")
         assert any("photo.jpg" in u for u in urls)
 
+    def test_root_relative_path_ignored(self):
+        js = 'img.src = "/images/photo.jpg"'
+        assert self.dl._extract_js_urls(js, "http://example.com/") == []
+
+    def test_url_found_by_several_patterns_listed_once(self):
+        js = 'img.src = "http://example.com/photo.jpg"; fetch("http://example.com/photo.jpg")'
+        urls = self.dl._extract_js_urls(js, "http://example.com/")
+        assert urls == ["http://example.com/photo.jpg"]
+
 
 # ===================================================================
 # _optimize_image
@@ -1036,7 +1192,7 @@ class TestDownloadFile:
 
     def test_corrupted_font_returns_none(self):
         mock_response = Mock()
-        mock_response.content = b'<!DOCTYPE html><html>Error</html>'
+        mock_response.raw.read = Mock(return_value=b'<!DOCTYPE html><html>Error</html>')
         mock_response.raise_for_status = Mock()
         mock_response.status_code = 200
         self.dl.session.get = Mock(return_value=mock_response)
@@ -1044,6 +1200,20 @@ class TestDownloadFile:
         result = self.dl.download_file("http://example.com/font.woff")
         assert result is None
         assert len(self.dl.corrupted_fonts) > 0
+        # Only the sniff bytes were read before the connection was closed
+        mock_response.raw.read.assert_called_once_with(256, decode_content=True)
+        mock_response.close.assert_called_once()
+
+    def test_valid_font_streamed_in_full(self):
+        mock_response = Mock()
+        mock_response.raw.read = Mock(side_effect=[b'wOF2' + b'\x00' * 252, b'\x01' * 1000])
+        mock_response.raise_for_status = Mock()
+        mock_response.status_code = 200
+        self.dl.session.get = Mock(return_value=mock_response)
+
+        result = self.dl.download_file("http://example.com/font.woff2")
+        assert result == b'wOF2' + b'\x00' * 252 + b'\x01' * 1000
+        assert self.dl.session.get.call_args.kwargs["stream"] is True
 
     def test_html_page_tries_iframe_first(self):
         """HTML pages should try the if_ version first."""
@@ -1203,6 +1373,13 @@ class TestProcessHtml:
         processed, _ = self.dl._process_html(html, "http://example.com/")
         assert "wm-ipp" not in processed
 
+    def test_builtin_parser_fallback(self):
+        html = '<html><body><div id="wm-ipp">Banner</div><a href="/about">About</a></body></html>'
+        with patch("wayback_archive.downloader._HTML_PARSER", "html.parser"):
+            processed, links = self.dl._process_html(html, "http://example.com/")
+        assert "wm-ipp" not in processed
+        assert "/about" in links
+
     def test_removes_wayback_scripts(self):
         html = '<html><head><script src="https://web.archive.org/static/js/wombat.js"></script></head><body>Content</body></html>'
         processed, _ = self.dl._process_html(html, "http://example.com/")
@@ -1359,6 +1536,16 @@ class TestProcessHtml:
         processed, _ = self.dl._process_html(html, "http://example.com/")
         assert "other.com" in processed
 
+    def test_nested_icon_group_links_preserved_siblings_not(self):
+        """Only links below an icon group container are preserved."""
+        self.dl.config.remove_external_links_keep_anchors = True
+        html = ('<html><body><ul class="Social-Icons-Group"><li><span>'
+                '<a href="http://other.com/icon">Icon</a></span></li></ul>'
+                '<p><a href="http://other.com/plain">Plain</a></p></body></html>')
+        processed, _ = self.dl._process_html(html, "http://example.com/")
+        assert "other.com/icon" in processed
+        assert "other.com/plain" not in processed
+
     def test_data_attributes_rewrite(self):
         """data-* attributes containing domain URLs should be rewritten."""
         html = '<html><body><div data-src="http://example.com/image.jpg">Content</div></body></html>'
@@ -1378,6 +1565,12 @@ class TestProcessHtml:
         assert "web.archive.org" not in processed
         assert any("img" in l for l in links)
 
+    def test_repeated_references_queued_once(self):
+        html = ('<html><body><a href="/about">A</a><a href="/web/20250417203037/http://example.com/about">B</a>'
+                '<img src="/logo.png"><img src="/logo.png"></body></html>')
+        _, links = self.dl._process_html(html, "http://example.com/index.html")
+        assert links == ["/about", "/logo.png"]
+
     def test_squarespace_cdn_image_rewrite(self):
         html = '<html><body><img src="https://images.squarespace-cdn.com/content/v1/photo.jpg"></body></html>'
         processed, links = self.dl._process_html(html, "http://example.com/index.html")
@@ -1494,6 +1687,60 @@ class TestDownloadMain:
         dl.download_file = Mock(return_value=b'\x89PNG\r\n\x1a\n' + b'\x00' * 100)
         dl.download()
 
+    def test_download_optimizes_images_in_worker_pool(self, tmp_path):
+        """Optimized images are written once the worker pool finishes them."""
+        from PIL import Image
+        from io import BytesIO
+        buf = BytesIO()
+        Image.new("RGBA", (8, 8), (255, 0, 0, 128)).save(buf, format="PNG")
+        dl = self._make_dl(tmp_path, "http://example.com/image.png")
+        dl.config.max_files = 1
+        dl.config.optimize_images = True
+        dl.download_file = Mock(return_value=buf.getvalue())
+        dl.download()
+        saved = dl.config.downloaded_files["http://example.com/image.png"]
+        assert Image.open(saved).mode == "RGB"
+        assert dl._image_pool is None
+
+    def test_download_keeps_original_when_image_optimization_fails(self, tmp_path):
+        content = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
+        dl = self._make_dl(tmp_path, "http://example.com/image.png")
+        dl.config.max_files = 1
+        dl.config.optimize_images = True
+        dl.download_file = Mock(return_value=content)
+        dl.download()
+        saved = dl.config.downloaded_files["http://example.com/image.png"]
+        assert Path(saved).read_bytes() == content
+
+    def test_download_finishes_images_when_interrupted(self, tmp_path):
+        """Submitted images are still written and pools stopped if the loop raises."""
+        content = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
+        dl = self._make_dl(tmp_path, "http://example.com/image.png")
+        dl.config.optimize_images = True
+        dl.download_file = Mock(return_value=content)
+        submit_image = dl._submit_image
+
+        def submit_then_interrupt(*args):
+            submit_image(*args)
+            raise KeyboardInterrupt
+
+        dl._submit_image = submit_then_interrupt
+        with pytest.raises(KeyboardInterrupt):
+            dl.download()
+        saved = dl.config.downloaded_files["http://example.com/image.png"]
+        assert Path(saved).read_bytes() == content
+        assert dl._image_pool is None
+        assert dl._download_pool is None
+
+    def test_download_counts_only_saved_files(self, tmp_path, capsys):
+        """Files that could not be written are not reported as downloaded."""
+        dl = self._make_dl(tmp_path, "http://example.com/font.woff2")
+        dl.config.max_files = 1
+        dl.download_file = Mock(return_value=b'\x00\x01\x00\x00' + b'\x00' * 100)
+        with patch.object(Path, "write_bytes", side_effect=OSError("disk full")):
+            dl.download()
+        assert "Files successfully downloaded: 0" in capsys.readouterr().out
+
     def test_download_processes_font_file(self, tmp_path):
         """Font files should be saved as-is."""
         dl = self._make_dl(tmp_path, "http://example.com/font.woff2")
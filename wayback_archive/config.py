@@ -28,6 +28,8 @@ class Config:
 
         # Output
         self.output_dir: str = get_str_env("OUTPUT_DIR", "./output")
+        # Print a status line for every downloaded file
+        self.verbose: bool = get_bool_env("VERBOSE", True)
 
         # HTML optimization
         self.optimize_html: bool = get_bool_env("OPTIMIZE_HTML", True)
@@ -1,11 +1,19 @@
 """Core downloader module for Wayback-Archive."""
 
+import hashlib
 import os
 import posixpath
 import re
 import sys
+import threading
 import mimetypes
+import multiprocessing
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from functools import lru_cache
+from io import BytesIO
 from urllib.parse import urljoin, urlparse, unquote
 from pathlib import Path
 from typing import Optional, Set, Dict, List, Tuple
@@ -13,6 +21,363 @@ import requests
 from bs4 import BeautifulSoup, Comment
 from wayback_archive.config import Config
 
+try:
+    import ahocorasick
+except ImportError:
+    # Optional accelerator; regex matching is used when unavailable
+    ahocorasick = None
+
+# Minifiers are bound once at import so the per-call path is a plain call
+try:
+    import minify_html
+    _minify_html = minify_html.minify
+except ImportError:
+    _minify_html = None
+
+try:
+    import rjsmin
+    _jsmin = rjsmin.jsmin
+except ImportError:
+    _jsmin = None
+
+try:
+    import cssmin
+    _cssmin = cssmin.cssmin
+except ImportError:
+    _cssmin = None
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    # Optional progress bar shown when per-file output is turned off
+    tqdm = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pyvips
+except (ImportError, OSError):
+    # Optional; OSError is raised when the libvips shared library is missing
+    pyvips = None
+
+# lxml parses in C; fall back to the most lenient parser available when it
+# is missing, since archived pages are often malformed
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = "lxml"
+except ImportError:
+    try:
+        import html5lib  # noqa: F401
+        _HTML_PARSER = "html5lib"
+    except ImportError:
+        _HTML_PARSER = "html.parser"
+
+# Wayback replay URL: /web/TIMESTAMP/https://original.com/path, including
+# replay variants such as im_, cs_, js_, jm_, if_, and fw_
+_WB_URL_RE = re.compile(r"(?:https?://web\.archive\.org)?/web/\d+(?:[a-z]+_)?/(https?://[^\"\s'<>\)]+)")
+
+# mailto:/tel:/whatsapp: etc. wrapped in a Wayback replay URL
+_WB_PROTO_RE = re.compile(r"(?:https?://web\.archive\.org)?/web/\d+[a-z]*/(mailto:|tel:|whatsapp:|sms:|callto:)(.+)")
+
+# Wayback replay prefix per asset extension (fonts are served as im_ too)
+_EXT_TO_PREFIX = {
+    ".jpg": "im_", ".jpeg": "im_", ".png": "im_", ".gif": "im_", ".svg": "im_",
+    ".webp": "im_", ".ico": "im_", ".bmp": "im_",
+    ".woff": "im_", ".woff2": "im_", ".ttf": "im_", ".eot": "im_", ".otf": "im_",
+    ".css": "cs_",
+    ".js": "js_", ".mjs": "js_",
+}
+
+# Content type by extension when mimetypes has no answer; images default to
+# JPEG and are refined from the actual content
+_EXT_TO_CT = {
+    ".css": "text/css",
+    ".js": "application/javascript", ".mjs": "application/javascript",
+    ".woff": "font/woff2", ".woff2": "font/woff2", ".ttf": "font/woff2", ".eot": "font/woff2", ".otf": "font/woff2",
+    ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/jpeg", ".gif": "image/jpeg", ".svg": "image/jpeg",
+    ".webp": "image/jpeg", ".ico": "image/jpeg", ".bmp": "image/jpeg", ".tiff": "image/jpeg",
+    ".json": "application/json",
+    ".xml": "application/xml",
+    ".pdf": "application/pdf",
+    ".mp4": "video/mp4", ".webm": "video/mp4", ".ogg": "video/mp4",
+    ".mp3": "audio/mpeg", ".wav": "audio/mpeg",
+}
+
+# Leading bytes of image formats, for files whose type the URL doesn't tell
+_IMAGE_SIGNATURES = (
+    (b'\x89PNG', "image/png"),
+    (b'\xff\xd8\xff', "image/jpeg"),
+    (b'GIF', "image/gif"),
+)
+_RE_LEADING_WS = re.compile(rb'\s*')
+
+# Elements carrying the Wayback Machine toolbar, identified by id
+_BANNER_TAGS = frozenset(("iframe", "div", "script", "link"))
+_BANNER_IDS = ("wm-ipp", "wm-bipp", "wm-toolbar", "wm-ipp-base")
+
+# Markers of Wayback Machine replay code in inline scripts and script URLs
+_WAYBACK_SCRIPT_MARKERS = ("__wm", "wombat", "RufflePlayer", "web.archive.org")
+_WAYBACK_SCRIPT_SRC_MARKERS = ("web.archive.org", "web-static.archive.org", "bundle-playback.js", "wombat.js", "ruffle.js")
+
+# libvips save options per output format. Only PNG is listed: libvips
+# compresses it markedly faster and smaller than Pillow, while Pillow's JPEG
+# and WebP encoders are as fast or faster.
+_VIPS_SAVE_OPTIONS = {
+    "PNG": ".png[compression=9,strip]",
+}
+
+# Squarespace CDN hosts whose assets are downloaded like internal ones
+_SQUARESPACE_DOMAINS = (
+    'static1.squarespace.com',
+    'static.squarespace.com',
+    'images.squarespace-cdn.com',
+    'definitions.sqspcdn.com',
+    'sqspcdn.com',
+)
+
+# Extensions treated as font files
+_FONT_EXTS = ('.woff', '.woff2', '.ttf', '.eot', '.otf', '.svg')
+
+# Font file references inside CSS url() functions
+_FONT_URL_RE = re.compile(r'url\s*\(\s*["\']?([^"\']*\.(?:woff|woff2|ttf|eot|otf|svg))["\']?\s*\)', re.IGNORECASE)
+
+# Cleanup left behind after removing src entries from @font-face rules
+_RE_DOUBLE_COMMA = re.compile(r',\s*,+')
+_RE_TRAILING_COMMA = re.compile(r',\s*}')
+_RE_SRC_LEADING_COMMA = re.compile(r'src:\s*,')
+_RE_SRC_EMPTY = re.compile(r'src:\s*;')
+
+# Legacy .eot / SVG font references
+_RE_EOT_WITH_COMMA = re.compile(r',\s*url\s*\(\s*["\']?[^"\']*\.eot["\']?\s*\)\s*(?:format\s*\([^)]+\))?', re.IGNORECASE)
+_RE_EOT = re.compile(r'url\s*\(\s*["\']?[^"\']*\.eot["\']?\s*\)\s*(?:format\s*\([^)]+\))?', re.IGNORECASE)
+_RE_EOT_SRC = re.compile(r'src:\s*url\s*\(\s*["\']?[^"\']*\.eot["\']?\s*\)\s*;', re.IGNORECASE)
+_RE_SVG_FONT_WITH_COMMA = re.compile(r',\s*url\s*\(\s*["\']?[^"\']*\.svg["\']?\s*\)\s+format\s*\(["\']?svg["\']?\)', re.IGNORECASE)
+_RE_SVG_FONT = re.compile(r'url\s*\(\s*["\']?[^"\']*\.svg["\']?\s*\)\s+format\s*\(["\']?svg["\']?\)', re.IGNORECASE)
+
+# CSS @import and url() references
+_RE_IMPORT = re.compile(r'@import\s+(?:url\()?["\']?([^"\'()]+)["\']?\)?', re.IGNORECASE)
+_RE_URL = re.compile(r'url\s*\(\s*["\']?([^"\'()]+)["\']?\s*\)', re.IGNORECASE)
+
+# Any url() reference; _rewrite_css_urls decides per captured URL whether to rewrite it
+_RE_CSS_URL_ANY = re.compile(r'url\s*\(\s*["\']?(?P<u>[^"\'()]+)["\']?\s*\)', re.IGNORECASE)
+
+# Wayback-wrapped url() references in inline style attributes
+_RE_STYLE_WAYBACK_URLS = (
+    re.compile(r'url\s*\(\s*["\']?(/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/https?://[^"\'()]+)["\']?\s*\)', re.IGNORECASE),  # Relative wayback
+    re.compile(r'url\s*\(\s*["\']?(https?://web\.archive\.org/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/https?://[^"\'()]+)["\']?\s*\)', re.IGNORECASE),  # Absolute wayback
+    re.compile(r'url\s*\(\s*["\']?(https?://web\.archive\.org/[^"\'()]+)["\']?\s*\)', re.IGNORECASE),  # Simple web.archive.org URL
+)
+_RE_STYLE_WAYBACK = re.compile(r"/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/(https?://[^\"\s'()]+)")
+
+# srcset candidates: trailing width/density descriptor and Wayback asset URLs
+_RE_SRCSET_DESCRIPTOR = re.compile(r'\s+(\d+(?:\.\d+)?[xw])$')
+_RE_SRCSET_WAYBACK = re.compile(r'/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/(https?://[^\s"\'<>\)]+)')
+
+# Contact links wrapped in Wayback URLs inside floating button containers
+_RE_WB_CONTACT_PROTO = re.compile(r"/web/\d+[a-z]*/(tel:|mailto:|whatsapp:)(.+)")
+_RE_WB_MAILTO = (
+    re.compile(r"/web/\d+[a-z]*/(mailto:[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"),
+    re.compile(r"https?://web\.archive\.org/web/\d+[a-z]*/(mailto:[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"),
+)
+_RE_WB_HIDDEN_EMAIL = re.compile(r"/web/\d+[a-z]*/https?://[^/]+/([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})")
+
+# URL references in JavaScript; specific enough to avoid matching code snippets.
+# Each pattern is paired with literals one of which must occur for it to match,
+# so scripts without them skip the regex entirely.
+_JS_URL_PATTERNS = (
+    (("fetch", "XMLHttpRequest", "axios.", ".load", ".ajax"),
+     re.compile(r'(?:fetch|XMLHttpRequest|axios\.get|axios\.post|\.load|\.ajax)\s*\(\s*["\']([^"\']+)["\']')),  # Fetch/ajax calls
+    ((".src",), re.compile(r'\.src\s*=\s*["\']([^"\']+)["\']')),  # src assignments
+    ((".href",), re.compile(r'\.href\s*=\s*["\']([^"\']+)["\']')),  # href assignments
+    (("url",), re.compile(r'url\s*[:=]\s*["\'](https?://[^"\']+)["\']')),  # URL properties
+    (("http",), re.compile(r'["\'](https?://[^"\']+\.(?:jpg|jpeg|png|gif|svg|webp|css|js|woff|woff2|ttf|eot|otf)[^"\']*)["\']')),  # Asset URLs
+)
+
+# Captured strings containing these are code rather than URLs
+_JS_CODE_MARKERS = ("function", "return", "if", "else", "var ", "let ", "const ")
+
+
+def _cleanup_font_src(css: str) -> str:
+    """Tidy commas and empty src: declarations left after removing font URLs."""
+    if ',' in css:
+        css = _RE_DOUBLE_COMMA.sub(',', css)  # Multiple commas
+        css = _RE_TRAILING_COMMA.sub('}', css)  # Trailing comma before }
+    if 'src:' in css:
+        css = _RE_SRC_LEADING_COMMA.sub('src:', css)  # src: with leading comma
+        css = _RE_SRC_EMPTY.sub('', css)  # Empty src:;
+    return css
+
+def _build_literal_matcher(patterns: List[str]):
+    """Build an Aho-Corasick automaton from escaped literal regex patterns.
+
+    Returns None when pyahocorasick is not installed.
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for pattern in patterns:
+        literal = pattern.replace("\\.", ".").lower()
+        automaton.add_word(literal, literal)
+    automaton.make_automaton()
+    return automaton
+
+
+# URLs are parsed many times per page (links, assets, CSS url()s, link
+# following); ParseResult is an immutable tuple so sharing it is safe.
+_urlparse = lru_cache(maxsize=4096)(urlparse)
+
+
+@lru_cache(maxsize=4096)
+def _original_url_from_path(path: str) -> Optional[str]:
+    """Extract the original URL from a Wayback Machine replay path (cached)."""
+    # Handle protocol-relative URLs: //web.archive.org/web/...
+    if path.startswith("//"):
+        path = "https:" + path
+    
+    # Pattern: /web/TIMESTAMP/https://original.com/path and replay variants
+    match = _WB_URL_RE.search(path)
+    if match:
+        extracted = match.group(1)
+        extracted = extracted.rstrip('.,;:)\'"')
+        return extracted
+    
+    # Pattern for mailto:/tel:/whatsapp: in wayback URLs
+    # Handle both /web/... and https://web.archive.org/web/...
+    match = _WB_PROTO_RE.search(path)
+    if match:
+        protocol = match.group(1)
+        rest = match.group(2).split("?")[0].split("&")[0]  # Remove query params
+        return protocol + rest
+    
+    return None
+
+@lru_cache(maxsize=32768)
+def _strip_query(url: str) -> str:
+    """Drop the query string and fragment from a URL (cached)."""
+    return _urlparse(url)._replace(fragment="", query="").geturl()
+
+
+@lru_cache(maxsize=32768)
+def _normalize_for_tracking(url: str) -> str:
+    """Key a URL for visited tracking: no query or fragment, www-agnostic (cached)."""
+    parsed = _urlparse(url)
+    # Normalize www/non-www to avoid downloading same page twice
+    netloc_normalized = parsed.netloc.lower().removeprefix("www.")
+    return parsed._replace(netloc=netloc_normalized, fragment="", query="").geturl()
+
+
+@lru_cache(maxsize=1024)
+def _short_hash(text: str) -> str:
+    """Eight hex digits identifying a string, used to build stable file names (cached).
+
+    MD5 is kept so names match files saved by earlier runs.
+    """
+    return hashlib.md5(text.encode()).hexdigest()[:8]
+
+
+@lru_cache(maxsize=1024)
+def _google_font_relpath(url: str) -> str:
+    """Map a Google Fonts URL to its root-relative local path (cached)."""
+    # Construct path directly from URL to avoid path duplication
+    parsed = _urlparse(url)
+    font_path = parsed.path.lstrip("/")
+    if "fonts.gstatic.com" in parsed.netloc:
+        # Path will be like fonts.gstatic.com/s/montserrat/v29/...
+        # Check if path already contains the domain (avoid duplication)
+        if not font_path.startswith("fonts.gstatic.com"):
+            font_path = f"{parsed.netloc}/{font_path}"
+    return "/" + font_path
+
+@lru_cache(maxsize=32768)
+def _wayback_url(url: str, timestamp: str, use_iframe: bool = False) -> str:
+    """Build the Wayback Machine URL for ``url`` at ``timestamp``.
+
+    Cached at module level; the timestamp is part of the key so results
+    stay correct across downloader instances.
+    """
+    if url.startswith("http://web.archive.org") or url.startswith("https://web.archive.org"):
+        return url
+    
+    # For HTML pages, use 'if_' prefix to get unwrapped content (no Wayback interface)
+    if use_iframe:
+        return f"https://web.archive.org/web/{timestamp}if_/{url}"
+    
+    # Determine asset type prefix (im_, cs_, js_)
+    ext = os.path.splitext(_urlparse(url).path)[1].lower()
+    asset_prefix = _EXT_TO_PREFIX.get(ext, "")
+    
+    if asset_prefix:
+        return f"https://web.archive.org/web/{timestamp}{asset_prefix}/{url}"
+    return f"https://web.archive.org/web/{timestamp}/{url}"
+
+
+def _optimize_image_data(content: bytes, format: str = "JPEG") -> bytes:
+    """Re-encode image bytes in the given format.
+
+    Module-level so it can run in a worker process. Raises on images that
+    cannot be decoded.
+    """
+    if pyvips is not None and format.upper() in _VIPS_SAVE_OPTIONS:
+        return _optimize_image_vips(content, format.upper())
+    if Image is None:
+        raise RuntimeError("Pillow is not installed")
+
+    img = Image.open(BytesIO(content))
+    
+    # Convert RGBA to RGB for JPEG
+    if format.upper() == "JPEG" and img.mode == "RGBA":
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3])
+        img = background
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    output = BytesIO()
+    img.save(output, format=format, optimize=True, quality=85)
+    return output.getvalue()
+
+
+def _optimize_image_vips(content: bytes, format: str) -> bytes:
+    """Re-encode an image with libvips, mirroring the Pillow conversions."""
+    img = pyvips.Image.new_from_buffer(content, "")
+    if img.hasalpha():
+        # Like Pillow's convert("RGB"), drop the alpha channel
+        img = img.extract_band(0, n=img.bands - 1)
+    if img.interpretation not in ("srgb", "b-w"):
+        img = img.colourspace("srgb")
+    return img.write_to_buffer(_VIPS_SAVE_OPTIONS[format])
+
+
+@lru_cache(maxsize=32768)
+def _file_type(url: str) -> str:
+    """Get a human-readable file type from URL (cached)."""
+    parsed = _urlparse(url)
+    path = parsed.path.lower()
+    
+    # Check for Google Fonts CSS files (they don't have .css extension)
+    if "fonts.googleapis.com" in url and "/css" in url:
+        return "CSS"
+    
+    if path.endswith('.html') or path.endswith('.htm') or not os.path.splitext(path)[1]:
+        return "HTML"
+    elif path.endswith('.css'):
+        return "CSS"
+    elif path.endswith('.js') or path.endswith('.mjs'):
+        return "JavaScript"
+    elif any(path.endswith(ext) for ext in ['.woff', '.woff2', '.ttf', '.eot', '.otf', '.svg']):
+        return "Font"
+    elif any(path.endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico']):
+        return "Image"
+    elif path.endswith('.json'):
+        return "JSON"
+    elif path.endswith('.xml'):
+        return "XML"
+    else:
+        return "Asset"
+
 
 class WaybackDownloader:
     """Main downloader class for Wayback Machine archives."""
@@ -57,6 +422,19 @@ class WaybackDownloader:
         r"^callto:",
     ]
 
+    # Worker threads shared by concurrent network probes
+    MAX_WORKERS = 8
+
+    # Bytes needed to tell a real font from an HTML error page
+    FONT_SNIFF_BYTES = 256
+
+    # Images handed to the optimization pool before waiting for results
+    IMAGE_BATCH_SIZE = 32
+
+    # Longest CSS text whose extracted URLs are memoized (inline styles and
+    # small <style> blocks; stylesheets are fetched once anyway)
+    CSS_CACHE_MAX_CHARS = 4096
+
     def __init__(self, config: Config):
         """Initialize downloader with configuration."""
         self.config = config
@@ -66,36 +444,207 @@ class WaybackDownloader:
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
             }
         )
+        # Prefetch threads and font probes share the session, so keep enough
+        # pooled connections for both instead of urllib3's default of 10
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=2 * self.MAX_WORKERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         # Track corrupted font files (HTML error pages instead of actual fonts)
         self.corrupted_fonts: Set[str] = set()
+        # Output and font marks buffered by the current prefetch thread
+        self._worker_local = threading.local()
+        # Shared thread pool, created lazily on first use
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Threads downloading queued files ahead of processing, created lazily
+        self._download_pool: Optional[ThreadPoolExecutor] = None
+        # Worker processes for CPU-bound image optimization, created lazily
+        self._image_pool: Optional[ProcessPoolExecutor] = None
+        self._pending_images: List[Tuple[object, str, Path, bytes]] = []
+        # Single-pass matchers for tracker/ad URLs (None without pyahocorasick)
+        self._tracker_ac = _build_literal_matcher(self.TRACKER_PATTERNS)
+        self._ad_ac = _build_literal_matcher(self.AD_PATTERNS)
+        # Substrings marking an inline script as tracking code
+        self._inline_tracker_markers = tuple(self.TRACKER_PATTERNS) + ("gtag", "datalayer", "google-analytics")
+        # The same URLs are checked over and over while crawling a site, and
+        # these checks only depend on the URL and the class patterns
+        self._tracker_cache = lru_cache(maxsize=2048)(self._is_tracker_uncached)
+        self._ad_cache = lru_cache(maxsize=2048)(self._is_ad_uncached)
+        self._contact_cache = lru_cache(maxsize=2048)(self._is_contact_link_uncached)
+        # Navigation and shared assets repeat across a page and across pages
+        # in the same directory; the current page is part of the key
+        self._relative_link_cache = lru_cache(maxsize=4096)(self._get_relative_link_path_uncached)
+        self._relative_path_cache = lru_cache(maxsize=4096)(self._to_relative_path_uncached)
         self._parse_wayback_url()
+        self.refresh_config()
+
+    def refresh_config(self):
+        """Re-read config values that hot paths cache on the instance.
+
+        Call this after changing ``config.output_dir``, ``config.base_url``
+        or ``config.domain`` on an existing downloader; ``download()`` does
+        so automatically.
+        """
+        # Output directory as a Path, built once instead of per asset
+        self._output_root = Path(self.config.output_dir)
+        self._base_url = self.config.base_url
+        self._domain_lower = (self.config.domain or "").lower().removeprefix("www.")
+        # Internal/normalized URL results depend on the domain, so start afresh
+        self._internal_cache = lru_cache(maxsize=2048)(self._is_internal_url_uncached)
+        self._normalize_cache = lru_cache(maxsize=4096)(self._normalize_url_uncached)
+        self._css_urls_cache = lru_cache(maxsize=1024)(self._extract_css_urls_uncached)
+        # Directories already created under the output root
+        self._created_dirs: Set[Path] = set()
+
+    def _log(self, message: str, always: bool = False):
+        """Print a per-file progress line unless verbose output is turned off.
+
+        ``always`` prints the line regardless of VERBOSE (warnings). Inside a
+        prefetch thread the line is held back and printed by the main thread
+        along with the rest of that file's output.
+        """
+        pending = getattr(self._worker_local, "pending", None)
+        if pending is not None:
+            pending[0].append((message, always))
+        elif always or self.config.verbose:
+            print(message, flush=True)
+
+    def _mark_corrupted_font(self, url: str):
+        """Record a font file that turned out to be an HTML error page."""
+        normalized_url = self._normalize_url(url, self._base_url)
+        pending = getattr(self._worker_local, "pending", None)
+        if pending is not None:
+            # Merged into corrupted_fonts by the main thread, which also reads it
+            pending[1].append(normalized_url)
+        else:
+            self.corrupted_fonts.add(normalized_url)
+        self._log(f"         ⚠️  Font file is corrupted (HTML error page) - will be removed from CSS", always=True)
+
+    def _download_in_background(self, url: str) -> Tuple[Optional[bytes], List[Tuple[str, bool]], List[str]]:
+        """Run download_file in a prefetch thread.
+
+        Returns the content together with the status lines and corrupted fonts
+        it produced, for the main thread to apply once it reaches the file.
+        """
+        lines: List[Tuple[str, bool]] = []
+        fonts: List[str] = []
+        self._worker_local.pending = (lines, fonts)
+        try:
+            content = self.download_file(url)
+        finally:
+            self._worker_local.pending = None
+        return content, lines, fonts
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the shared thread pool, creating it on first use."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        return self._executor
+
+    def _shutdown_executor(self):
+        """Shut down the shared thread pool if it was started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _prefetch(self, queue, prefetched: Dict[str, object], limit: int):
+        """Start downloading the next queued files in background threads.
+
+        Parsing and saving stay on the calling thread in queue order; only the
+        network wait overlaps. ``prefetched`` maps URLs to their futures.
+        """
+        if limit <= len(prefetched):
+            return
+        if self._download_pool is None:
+            self._download_pool = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        for url in queue:
+            if len(prefetched) >= limit:
+                break
+            if url in prefetched or url.startswith("#"):
+                continue
+            if _normalize_for_tracking(url) in self.config.visited_urls:
+                continue
+            prefetched[url] = self._download_pool.submit(self._download_in_background, url)
+
+    def _shutdown_download_pool(self, prefetched: Dict[str, object]):
+        """Drop downloads that were started but are no longer needed."""
+        for future in prefetched.values():
+            future.cancel()
+        prefetched.clear()
+        if self._download_pool is not None:
+            self._download_pool.shutdown(wait=True)
+            self._download_pool = None
+
+    def _submit_image(self, url: str, local_path: Path, content: bytes, format: str):
+        """Optimize an image in a worker process and save it once done."""
+        if self._image_pool is None:
+            # spawn rather than fork: the crawl may have network threads running
+            self._image_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        future = self._image_pool.submit(_optimize_image_data, content, format)
+        self._pending_images.append((future, url, local_path, content))
+        if len(self._pending_images) >= self.IMAGE_BATCH_SIZE:
+            self._finish_images()
+
+    def _finish_images(self):
+        """Wait for submitted images and write them, keeping the original on failure."""
+        pending, self._pending_images = self._pending_images, []
+        for future, url, local_path, content in pending:
+            try:
+                optimized = future.result()
+            except Exception as e:
+                print(f"Error optimizing image: {e}")
+                optimized = content
+            try:
+                local_path.write_bytes(optimized)
+                self.config.downloaded_files[url] = str(local_path)
+            except Exception as e:
+                print(f"Error processing {url}: {e}")
+
+    def _shutdown_image_pool(self):
+        """Save any outstanding images and stop the worker processes."""
+        self._finish_images()
+        if self._image_pool is not None:
+            self._image_pool.shutdown(wait=True)
+            self._image_pool = None
 
     def _parse_wayback_url(self):
         """Parse the Wayback Machine URL to extract the original URL."""
         # Extract timestamp and URL from Wayback URL
         # Format: https://web.archive.org/web/TIMESTAMP/URL
-        match = re.match(
-            r"https?://web\.archive\.org/web/(\d+[a-z]*)/(.+)", self.config.wayback_url
-        )
-        if match:
-            timestamp, original_url = match.groups()
+        prefix, sep, rest = (self.config.wayback_url or "").partition("/web/")
+        timestamp, slash, original_url = rest.partition("/")
+        # TIMESTAMP is digits optionally followed by a replay suffix (e.g. "id", "if")
+        digits_end = 0
+        while digits_end < len(timestamp) and "0" <= timestamp[digits_end] <= "9":
+            digits_end += 1
+        suffix = timestamp[digits_end:]
+        if (
+            sep
+            and slash
+            and original_url
+            and digits_end
+            and prefix in ("http://web.archive.org", "https://web.archive.org")
+            and all("a" <= ch <= "z" for ch in suffix)
+        ):
             # Ensure original_url starts with http/https
             if not original_url.startswith(("http://", "https://")):
                 original_url = "http://" + original_url
             self.config.base_url = original_url
-            self.config.domain = urlparse(original_url).netloc
+            self.config.domain = _urlparse(original_url).netloc
             # Store original timestamp for timeframe fallback
             self.original_timestamp = timestamp
             # Parse timestamp to datetime for timeframe calculations
             try:
-                numeric_part = re.match(r'(\d+)', timestamp).group(1)
+                numeric_part = timestamp[:digits_end]
                 if len(numeric_part) >= 14:
                     self.original_datetime = datetime.strptime(numeric_part[:14], '%Y%m%d%H%M%S')
                 else:
                     # Pad with zeros if needed
                     padded = numeric_part + '0' * (14 - len(numeric_part))
                     self.original_datetime = datetime.strptime(padded, '%Y%m%d%H%M%S')
-            except (ValueError, AttributeError):
+            except ValueError:
                 # Fallback to current time if parsing fails
                 self.original_datetime = datetime.now()
         else:
@@ -106,6 +655,10 @@ class WaybackDownloader:
         
         Returns False for special schemes (tel:, mailto:, javascript:, etc.)
         """
+        return self._internal_cache(url)
+
+    def _is_internal_url_uncached(self, url: str) -> bool:
+        """Uncached implementation of _is_internal_url."""
         # Skip special URL schemes that shouldn't be downloaded
         non_downloadable_schemes = (
             'tel:', 'mailto:', 'javascript:', 'data:', 
@@ -115,39 +668,31 @@ class WaybackDownloader:
         if url_lower.startswith(non_downloadable_schemes) or url_lower == '#':
             return False
         
-        parsed = urlparse(url)
+        parsed = _urlparse(url)
         
         # Also check the parsed scheme
         if parsed.scheme and parsed.scheme.lower() not in ('http', 'https', ''):
             return False
         
-        url_domain = parsed.netloc.lower().lstrip("www.")
-        base_domain = self.config.domain.lower().lstrip("www.")
+        url_domain = parsed.netloc.lower().removeprefix("www.")
 
         # Treat Squarespace CDN as internal so we rewrite and download those assets.
-        if self._is_squarespace_cdn(url):
+        if any(domain in url_domain for domain in _SQUARESPACE_DOMAINS):
             return True
 
-        return url_domain == base_domain or url_domain == ""
+        return url_domain == self._domain_lower or url_domain == ""
 
     def _is_squarespace_cdn(self, url: str) -> bool:
         """Check if URL is from Squarespace CDN (should be downloaded)."""
-        squarespace_domains = [
-            'static1.squarespace.com',
-            'static.squarespace.com',
-            'images.squarespace-cdn.com',
-            'definitions.sqspcdn.com',
-            'sqspcdn.com'
-        ]
-        parsed = urlparse(url)
-        url_domain = parsed.netloc.lower().lstrip("www.")
-        return any(domain in url_domain for domain in squarespace_domains)
+        parsed = _urlparse(url)
+        url_domain = parsed.netloc.lower().removeprefix("www.")
+        return any(domain in url_domain for domain in _SQUARESPACE_DOMAINS)
 
     @staticmethod
     def _is_html_url(url: str, parsed=None) -> bool:
         """Determine if a URL likely points to an HTML page based on its path."""
         if parsed is None:
-            parsed = urlparse(url)
+            parsed = _urlparse(url)
         path_lower = parsed.path.lower()
         if not path_lower or path_lower == "/":
             return True
@@ -163,6 +708,12 @@ class WaybackDownloader:
 
     def _is_tracker(self, url: str) -> bool:
         """Check if URL is a tracker/analytics script."""
+        return self._tracker_cache(url)
+
+    def _is_tracker_uncached(self, url: str) -> bool:
+        """Uncached implementation of _is_tracker."""
+        if self._tracker_ac is not None:
+            return any(True for _ in self._tracker_ac.iter(url.lower()))
         for pattern in self.TRACKER_PATTERNS:
             if re.search(pattern, url, re.IGNORECASE):
                 return True
@@ -170,6 +721,12 @@ class WaybackDownloader:
 
     def _is_ad(self, url: str) -> bool:
         """Check if URL is an ad."""
+        return self._ad_cache(url)
+
+    def _is_ad_uncached(self, url: str) -> bool:
+        """Uncached implementation of _is_ad."""
+        if self._ad_ac is not None:
+            return any(True for _ in self._ad_ac.iter(url.lower()))
         for pattern in self.AD_PATTERNS:
             if re.search(pattern, url, re.IGNORECASE):
                 return True
@@ -177,19 +734,15 @@ class WaybackDownloader:
 
     def _is_contact_link(self, url: str) -> bool:
         """Check if URL is a contact link."""
+        return self._contact_cache(url)
+
+    def _is_contact_link_uncached(self, url: str) -> bool:
+        """Uncached implementation of _is_contact_link."""
         for pattern in self.CONTACT_PATTERNS:
             if re.search(pattern, url, re.IGNORECASE):
                 return True
         return False
 
-    def _convert_to_wayback_url(self, url: str) -> str:
-        """Convert a regular URL to a Wayback Machine URL.
-        
-        This method is kept for backward compatibility.
-        For timeframe fallback, use _convert_to_wayback_url_with_timestamp().
-        """
-        return self._convert_to_wayback_url_with_timestamp(url)
-    
     def _convert_to_wayback_url_with_timestamp(self, url: str, timestamp: str = None, use_iframe: bool = False) -> str:
         """Convert a regular URL to a Wayback Machine URL with optional timestamp.
         
@@ -198,37 +751,13 @@ class WaybackDownloader:
             timestamp: Optional timestamp (YYYYMMDDHHMMSS). If None, uses original timestamp.
             use_iframe: If True, use 'if_' prefix to get unwrapped HTML content (no Wayback interface)
         """
-        if url.startswith("http://web.archive.org") or url.startswith("https://web.archive.org"):
-            return url
-        
         if timestamp is None:
             timestamp = self.original_timestamp
-        
-        # For HTML pages, use 'if_' prefix to get unwrapped content (no Wayback interface)
-        if use_iframe:
-            return f"https://web.archive.org/web/{timestamp}if_/{url}"
-        
-        # Determine asset type prefix (im_, cs_, js_)
-        parsed = urlparse(url)
-        path = parsed.path.lower()
-        asset_prefix = ""
-        if any(ext in path for ext in [".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".bmp"]):
-            asset_prefix = "im_"
-        elif any(ext in path for ext in [".woff", ".woff2", ".ttf", ".eot", ".otf"]):
-            # Font files also use im_ prefix in Wayback Machine
-            asset_prefix = "im_"
-        elif any(ext in path for ext in [".css"]):
-            asset_prefix = "cs_"
-        elif any(ext in path for ext in [".js"]):
-            asset_prefix = "js_"
-        
-        if asset_prefix:
-            return f"https://web.archive.org/web/{timestamp}{asset_prefix}/{url}"
-        return f"https://web.archive.org/web/{timestamp}/{url}"
+        return _wayback_url(url, timestamp, use_iframe)
 
     def _make_relative_path(self, url: str) -> str:
         """Convert absolute URL to relative path."""
-        parsed = urlparse(url)
+        parsed = _urlparse(url)
         path = parsed.path or "/"
         suffix = ""
         if parsed.query:
@@ -242,36 +771,17 @@ class WaybackDownloader:
         if not path or not isinstance(path, str):
             return None
         
-        try:
-            # Handle protocol-relative URLs: //web.archive.org/web/...
-            if path.startswith("//"):
-                path = "https:" + path
-            
-            # Pattern: /web/TIMESTAMP/https://original.com/path and replay variants
-            # such as im_, cs_, js_, jm_, if_, and fw_.
-            wayback_url_pattern = r"(?:https?://web\.archive\.org)?/web/\d+(?:[a-z]+_)?/(https?://[^\"\s'<>\)]+)"
-            match = re.search(wayback_url_pattern, path)
-            if match:
-                extracted = match.group(1)
-                extracted = extracted.rstrip('.,;:)\'"')
-                return extracted
-            
-            # Pattern for mailto:/tel:/whatsapp: in wayback URLs
-            # Handle both /web/... and https://web.archive.org/web/...
-            wayback_protocol_pattern = r"(?:https?://web\.archive\.org)?/web/\d+[a-z]*/(mailto:|tel:|whatsapp:|sms:|callto:)(.+)"
-            match = re.search(wayback_protocol_pattern, path)
-            if match:
-                protocol = match.group(1)
-                rest = match.group(2).split("?")[0].split("&")[0]  # Remove query params
-                return protocol + rest
-        except Exception as e:
-            # Silently fail - return None if extraction fails
-            pass
-        
-        return None
+        return _original_url_from_path(path)
 
     def _normalize_url(self, url: str, base_url: str) -> str:
         """Normalize URL and handle www/non-www conversion."""
+        return self._normalize_cache(url, base_url, self.config.make_non_www, self.config.make_www)
+
+    def _normalize_url_uncached(self, url: str, base_url: str, make_non_www: bool, make_www: bool) -> str:
+        """Uncached implementation of _normalize_url.
+
+        The www settings are passed in so they form part of the cache key.
+        """
         # Extract original URL from wayback paths first (handles both absolute and relative)
         original = self._extract_original_url_from_path(url)
         if original:
@@ -293,26 +803,26 @@ class WaybackDownloader:
         # Handle protocol-relative URLs
         # Use the scheme from base_url to preserve http/https consistency
         if url.startswith("//"):
-            parsed_base = urlparse(base_url)
+            parsed_base = _urlparse(base_url)
             scheme = parsed_base.scheme if parsed_base.scheme else "http"
             url = f"{scheme}:{url}"
 
-        parsed = urlparse(url)
-        parsed_base = urlparse(base_url)
+        parsed = _urlparse(url)
+        parsed_base = _urlparse(base_url)
         
         # For internal URLs, preserve the scheme from base_url to ensure consistency
         # This prevents http:// URLs from being converted to https://
-        url_domain = parsed.netloc.lower().lstrip("www.")
-        base_domain = parsed_base.netloc.lower().lstrip("www.")
+        url_domain = parsed.netloc.lower().removeprefix("www.")
+        base_domain = parsed_base.netloc.lower().removeprefix("www.")
         if url_domain == base_domain or url_domain == "":
             # Internal URL - use base_url scheme
             if parsed_base.scheme and parsed.scheme != parsed_base.scheme:
                 parsed = parsed._replace(scheme=parsed_base.scheme)
 
         # Handle www/non-www conversion
-        if self.config.make_non_www and parsed.netloc.startswith("www."):
+        if make_non_www and parsed.netloc.startswith("www."):
             parsed = parsed._replace(netloc=parsed.netloc[4:])
-        elif self.config.make_www and not parsed.netloc.startswith("www.") and parsed.netloc:
+        elif make_www and not parsed.netloc.startswith("www.") and parsed.netloc:
             parsed = parsed._replace(netloc="www." + parsed.netloc)
 
         # Remove fragment and query string for file identification
@@ -323,13 +833,19 @@ class WaybackDownloader:
 
         return url_normalized
 
+    def _ensure_dir(self, directory: Path):
+        """Create a directory unless it was already created during this run."""
+        if directory not in self._created_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(directory)
+
     def _get_local_path(self, url: str) -> Path:
         """
         Get local file path for a URL.
         This ensures consistent file naming that works with static file servers.
         Files are saved without query strings or fragments for clean URLs.
         """
-        parsed = urlparse(url)
+        parsed = _urlparse(url)
         
         # Special handling for Google Fonts - preserve domain structure
         if "fonts.googleapis.com" in parsed.netloc or "fonts.gstatic.com" in parsed.netloc:
@@ -339,7 +855,7 @@ class WaybackDownloader:
             # Remove leading slashes
             while domain_path.startswith("/"):
                 domain_path = domain_path[1:]
-            return Path(self.config.output_dir) / domain_path
+            return self._output_root / domain_path
         
         # Special handling for Squarespace CDN - preserve domain structure
         # This prevents CDN root URLs from overwriting index.html
@@ -351,13 +867,10 @@ class WaybackDownloader:
             # If no path, add index.html under the domain folder
             if not parsed.path or parsed.path == "/":
                 domain_path = f"{parsed.netloc}/index.html"
-            return Path(self.config.output_dir) / domain_path
-        
-        path = unquote(parsed.path)
+            return self._output_root / domain_path
         
         # Remove leading slashes (handle both single and double slashes)
-        while path.startswith("/"):
-            path = path[1:]
+        path = unquote(parsed.path).lstrip("/")
         
         # Clean up any double slashes in the middle of the path
         while "//" in path:
@@ -367,31 +880,12 @@ class WaybackDownloader:
         if not path or path.endswith("/"):
             path = "index.html"
 
-        # Determine if this is likely a page (HTML) or an asset
-        # Check if it has a known asset extension
-        known_asset_extensions = {
-            ".css", ".js", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", 
-            ".ico", ".woff", ".woff2", ".ttf", ".eot", ".otf", ".pdf", ".zip",
-            ".mp4", ".mp3", ".avi", ".mov", ".wmv", ".flv", ".pdf", ".doc", ".docx"
-        }
-        
-        has_extension = "." in os.path.basename(path)
-        is_asset = False
-        if has_extension:
-            ext = os.path.splitext(path)[1].lower()
-            is_asset = ext in known_asset_extensions
-
-        # Add .html extension if no extension and it's not an asset (treat as page)
-        if not has_extension and not is_asset:
-            # If the path doesn't have a file extension, treat it as a page
-            dir_part = os.path.dirname(path) if os.path.dirname(path) else ""
-            base_part = os.path.basename(path) if os.path.basename(path) else "index"
-            if dir_part:
-                path = os.path.join(dir_part, base_part + ".html")
-            else:
-                path = base_part + ".html"
+        # A last segment without an extension is treated as a page;
+        # anything with an extension keeps its name as-is
+        if "." not in path.rpartition("/")[2]:
+            path += ".html"
 
-        return Path(self.config.output_dir) / path
+        return self._output_root / path
     
     def _get_relative_link_path(self, url: str, is_page: bool = True) -> str:
         """
@@ -404,7 +898,11 @@ class WaybackDownloader:
             is_page: If True, adds .html extension to paths without extensions.
                      If False, preserves the original extension (for assets).
         """
-        parsed = urlparse(url)
+        return self._relative_link_cache(url, is_page, getattr(self, '_current_page_url', None))
+
+    def _get_relative_link_path_uncached(self, url: str, is_page: bool, current_url: Optional[str]) -> str:
+        """Uncached implementation of _get_relative_link_path."""
+        parsed = _urlparse(url)
 
         # Special handling for Google Fonts URLs - preserve domain structure
         if "fonts.googleapis.com" in parsed.netloc or "fonts.gstatic.com" in parsed.netloc:
@@ -455,9 +953,8 @@ class WaybackDownloader:
             suffix += "#" + parsed.fragment
 
         # Compute truly relative path from the current page's directory
-        current_url = getattr(self, '_current_page_url', None)
         if current_url:
-            from_parsed = urlparse(current_url)
+            from_parsed = _urlparse(current_url)
             from_path = unquote(from_parsed.path)
             if not from_path or from_path.endswith("/"):
                 from_dir = from_path.rstrip("/") or "/"
@@ -471,10 +968,13 @@ class WaybackDownloader:
 
     def _to_relative_path(self, abs_path: str) -> str:
         """Convert a root-absolute path to one relative to the current page."""
-        current_url = getattr(self, '_current_page_url', None)
+        return self._relative_path_cache(abs_path, getattr(self, '_current_page_url', None))
+
+    def _to_relative_path_uncached(self, abs_path: str, current_url: Optional[str]) -> str:
+        """Uncached implementation of _to_relative_path."""
         if not current_url or not abs_path.startswith("/"):
             return abs_path
-        from_parsed = urlparse(current_url)
+        from_parsed = _urlparse(current_url)
         from_path = unquote(from_parsed.path)
         if not from_path or from_path.endswith("/"):
             from_dir = from_path.rstrip("/") or "/"
@@ -515,8 +1015,7 @@ class WaybackDownloader:
         This detects those cases.
         """
         # Check if it's a font file extension
-        font_extensions = ('.woff', '.woff2', '.ttf', '.eot', '.otf', '.svg')
-        if not any(url.lower().endswith(ext) for ext in font_extensions):
+        if not url.lower().endswith(_FONT_EXTS):
             return False
         
         # Check if content starts with HTML (error page)
@@ -526,6 +1025,21 @@ class WaybackDownloader:
             return True
         
         return False
+
+    def _read_font_body(self, response, url: str) -> Optional[bytes]:
+        """Read a streamed font response, stopping early on HTML error pages.
+
+        Only the first FONT_SNIFF_BYTES are read before the corruption check,
+        so a corrupted font's body is never transferred. Returns None if the
+        font is corrupted.
+        """
+        try:
+            head = response.raw.read(self.FONT_SNIFF_BYTES, decode_content=True)
+            if self._is_corrupted_font(head, url):
+                return None
+            return head + response.raw.read(decode_content=True)
+        finally:
+            response.close()
     
     def download_file(self, url: str) -> Optional[bytes]:
         """Download a file from the given URL with timeframe fallback.
@@ -535,9 +1049,11 @@ class WaybackDownloader:
         If all Wayback attempts fail, tries downloading from the original live URL.
         """
         # Determine if this is an HTML page (we should NOT fallback to live for HTML)
-        parsed = urlparse(url)
+        parsed = _urlparse(url)
         path_lower = parsed.path.lower()
         is_html_page = self._is_html_url(url, parsed)
+        # Font bodies are streamed so corrupted ones can be dropped early
+        is_font = url.lower().endswith(_FONT_EXTS)
         
         # For HTML pages, try the 'if_' version first to get unwrapped content
         # This avoids the Wayback Machine interface wrapper
@@ -556,7 +1072,8 @@ class WaybackDownloader:
                     # The if_ version still has Wayback scripts but also contains the actual page
                     # Check if it has actual page content (not just the wrapper interface)
                     try:
-                        html_str = content.decode("utf-8", errors="ignore")[:5000]
+                        # Only the start is inspected; 4 bytes per character at most
+                        html_str = content[:20000].decode("utf-8", errors="ignore")[:5000]
                         # Check if it's ONLY the wrapper (has Wayback Machine title AND no actual page content)
                         # The if_ version will have both Wayback scripts AND the actual page content
                         is_only_wrapper = (
@@ -579,17 +1096,18 @@ class WaybackDownloader:
         wayback_url = self._convert_to_wayback_url_with_timestamp(url)
         try:
             response = self.session.get(
-                wayback_url, timeout=15, allow_redirects=True
+                wayback_url, timeout=15, allow_redirects=True, stream=is_font
             )
             response.raise_for_status()
-            content = response.content
+            if is_font:
+                content = self._read_font_body(response, url)
+            else:
+                content = response.content
             
             # Check if font file is corrupted (HTML error page)
-            if self._is_corrupted_font(content, url):
+            if content is None:
                 # Mark as corrupted and don't return it
-                normalized_url = self._normalize_url(url, self.config.base_url)
-                self.corrupted_fonts.add(normalized_url)
-                print(f"         ⚠️  Font file is corrupted (HTML error page) - will be removed from CSS", flush=True)
+                self._mark_corrupted_font(url)
                 return None
             
             return content
@@ -616,23 +1134,22 @@ class WaybackDownloader:
                                     # (it may still have Wayback scripts but that's fine)
                                     # Check if font file is corrupted
                                     if self._is_corrupted_font(content, url):
-                                        normalized_url = self._normalize_url(url, self.config.base_url)
-                                        self.corrupted_fonts.add(normalized_url)
-                                        print(f"         ⚠️  Font file is corrupted (HTML error page) - will be removed from CSS", flush=True)
+                                        self._mark_corrupted_font(url)
                                         continue  # Try next timestamp
                                     return content
                             else:
                                 variant_url = self._convert_to_wayback_url_with_timestamp(url, timestamp)
                                 variant_response = self.session.get(
-                                    variant_url, timeout=10, allow_redirects=True
+                                    variant_url, timeout=10, allow_redirects=True, stream=is_font
                                 )
                                 if variant_response.status_code == 200:
-                                    content = variant_response.content
+                                    if is_font:
+                                        content = self._read_font_body(variant_response, url)
+                                    else:
+                                        content = variant_response.content
                                     # Check if font file is corrupted
-                                    if self._is_corrupted_font(content, url):
-                                        normalized_url = self._normalize_url(url, self.config.base_url)
-                                        self.corrupted_fonts.add(normalized_url)
-                                        print(f"         ⚠️  Font file is corrupted (HTML error page) - will be removed from CSS", flush=True)
+                                    if content is None:
+                                        self._mark_corrupted_font(url)
                                         continue  # Try next timestamp
                                     return content
                         except:
@@ -641,7 +1158,7 @@ class WaybackDownloader:
                 # All Wayback attempts failed - try original live URL as fallback (only for assets, not HTML pages)
                 if not is_html_page:
                     try:
-                        print(f"         🔄 Wayback failed, trying original URL: {url[:80]}...", flush=True)
+                        self._log(f"         🔄 Wayback failed, trying original URL: {url[:80]}...")
                         live_response = self.session.get(
                             url, timeout=10, allow_redirects=True
                         )
@@ -650,12 +1167,10 @@ class WaybackDownloader:
                         
                         # Check if font file is corrupted
                         if self._is_corrupted_font(content, url):
-                            normalized_url = self._normalize_url(url, self.config.base_url)
-                            self.corrupted_fonts.add(normalized_url)
-                            print(f"         ⚠️  Font file is corrupted (HTML error page) - will be removed from CSS", flush=True)
+                            self._mark_corrupted_font(url)
                             return None
                         
-                        print(f"         ✓ Downloaded from original URL (fallback)", flush=True)
+                        self._log(f"         ✓ Downloaded from original URL (fallback)")
                         return content
                     except requests.exceptions.HTTPError:
                         pass
@@ -668,7 +1183,7 @@ class WaybackDownloader:
             # Timeout on Wayback - try original URL as fallback (only for assets)
             if not is_html_page:
                 try:
-                    print(f"         🔄 Wayback timeout, trying original URL: {url[:80]}...", flush=True)
+                    self._log(f"         🔄 Wayback timeout, trying original URL: {url[:80]}...")
                     live_response = self.session.get(
                         url, timeout=10, allow_redirects=True
                     )
@@ -677,12 +1192,10 @@ class WaybackDownloader:
                     
                     # Check if font file is corrupted
                     if self._is_corrupted_font(content, url):
-                        normalized_url = self._normalize_url(url, self.config.base_url)
-                        self.corrupted_fonts.add(normalized_url)
-                        print(f"         ⚠️  Font file is corrupted (HTML error page) - will be removed from CSS", flush=True)
+                        self._mark_corrupted_font(url)
                         return None
                     
-                    print(f"         ✓ Downloaded from original URL (fallback)", flush=True)
+                    self._log(f"         ✓ Downloaded from original URL (fallback)")
                     return content
                 except Exception:
                     pass
@@ -693,53 +1206,28 @@ class WaybackDownloader:
     
     def _get_file_type_from_url(self, url: str) -> str:
         """Get a human-readable file type from URL."""
-        parsed = urlparse(url)
-        path = parsed.path.lower()
-        
-        # Check for Google Fonts CSS files (they don't have .css extension)
-        if "fonts.googleapis.com" in url and "/css" in url:
-            return "CSS"
-        
-        if path.endswith('.html') or path.endswith('.htm') or not os.path.splitext(path)[1]:
-            return "HTML"
-        elif path.endswith('.css'):
-            return "CSS"
-        elif path.endswith('.js') or path.endswith('.mjs'):
-            return "JavaScript"
-        elif any(path.endswith(ext) for ext in ['.woff', '.woff2', '.ttf', '.eot', '.otf', '.svg']):
-            return "Font"
-        elif any(path.endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico']):
-            return "Image"
-        elif path.endswith('.json'):
-            return "JSON"
-        elif path.endswith('.xml'):
-            return "XML"
-        else:
-            return "Asset"
+        return _file_type(url)
 
     def _optimize_html(self, html: str) -> str:
         """Optimize HTML code."""
-        if not self.config.optimize_html:
+        if not self.config.optimize_html or _minify_html is None:
             return html
 
         try:
-            import minify_html
             # minify-html is a Python 3.14+ compatible alternative to htmlmin
             # minify_html.minify() expects a string, not bytes
-            return minify_html.minify(html, minify_js=False, minify_css=False)
+            return _minify_html(html, minify_js=False, minify_css=False)
         except Exception as e:
             print(f"Error optimizing HTML: {e}")
             return html
 
     def _minify_js(self, content: str) -> str:
         """Minify JavaScript."""
-        if not self.config.minify_js:
+        if not self.config.minify_js or _jsmin is None:
             return content
 
         try:
-            import rjsmin
-
-            return rjsmin.jsmin(content)
+            return _jsmin(content)
         except Exception as e:
             print(f"Error minifying JS: {e}")
             return content
@@ -751,16 +1239,20 @@ class WaybackDownloader:
         even before they're queued for download.
         """
         # Find all font URLs in CSS
-        font_url_pattern = r'url\s*\(\s*["\']?([^"\']*\.(?:woff|woff2|ttf|eot|otf|svg))["\']?\s*\)'
-        font_urls = re.findall(font_url_pattern, css, re.IGNORECASE)
+        if '(' not in css:
+            return css
+        font_urls = _FONT_URL_RE.findall(css)
         
-        for font_url in font_urls:
+        # Resolve and deduplicate before probing - the same font is usually
+        # referenced several times across format fallback groups
+        to_probe: Dict[str, str] = {}
+        for font_url in dict.fromkeys(font_urls):
             # Convert relative URLs to absolute
             if not font_url.startswith(('http://', 'https://')):
                 # Try to construct absolute URL
                 if font_url.startswith('/'):
                     # Absolute path from domain
-                    font_url = f"{self.config.base_url.rstrip('/')}{font_url}"
+                    font_url = f"{self._base_url.rstrip('/')}{font_url}"
                 else:
                     # Relative path
                     font_url = urljoin(base_url, font_url)
@@ -768,24 +1260,55 @@ class WaybackDownloader:
             # Normalize URL
             normalized_font_url = self._normalize_url(font_url, base_url)
             
-            # Skip if already in corrupted set
-            if normalized_font_url in self.corrupted_fonts:
+            # Skip if already in corrupted set or already scheduled
+            if normalized_font_url in self.corrupted_fonts or normalized_font_url in to_probe:
                 continue
-            
-            # Try to download and check if corrupted (with quick timeout)
+            to_probe[normalized_font_url] = font_url
+        
+        if not to_probe:
+            return css
+        
+        # Probe all fonts concurrently (with quick timeout)
+        executor = self._get_executor()
+        futures = {
+            executor.submit(self._probe_font_is_corrupted, font_url): (normalized_font_url, font_url)
+            for normalized_font_url, font_url in to_probe.items()
+        }
+        for future in as_completed(futures):
+            normalized_font_url, font_url = futures[future]
             try:
-                wayback_url = self._convert_to_wayback_url_with_timestamp(font_url)
-                response = self.session.get(wayback_url, timeout=5, allow_redirects=True)
-                if response.status_code == 200:
-                    if self._is_corrupted_font(response.content, font_url):
-                        self.corrupted_fonts.add(normalized_font_url)
-                        print(f"         ⚠️  Detected corrupted font in CSS: {os.path.basename(font_url)}", flush=True)
-            except Exception as e:
+                is_corrupted = future.result()
+            except Exception:
                 # If we can't check, skip - it will be checked when actually downloaded
                 # Don't print errors here to avoid spam
-                pass
+                continue
+            if is_corrupted:
+                self.corrupted_fonts.add(normalized_font_url)
+                print(f"         ⚠️  Detected corrupted font in CSS: {os.path.basename(font_url)}", flush=True)
         
         return css
+
+    def _probe_font_is_corrupted(self, font_url: str) -> bool:
+        """Fetch only the first bytes of a font and check if it's an HTML error page.
+
+        Uses a Range request and reads at most FONT_SNIFF_BYTES from the stream,
+        so the full font body is never transferred.
+        """
+        wayback_url = self._convert_to_wayback_url_with_timestamp(font_url)
+        response = self.session.get(
+            wayback_url,
+            timeout=5,
+            allow_redirects=True,
+            headers={"Range": f"bytes=0-{self.FONT_SNIFF_BYTES - 1}"},
+            stream=True,
+        )
+        try:
+            if response.status_code not in (200, 206):
+                return False
+            head = response.raw.read(self.FONT_SNIFF_BYTES, decode_content=True)
+            return self._is_corrupted_font(head, font_url)
+        finally:
+            response.close()
     
     def _remove_corrupted_fonts_from_css(self, css: str) -> str:
         """Remove references to corrupted font files from CSS.
@@ -796,57 +1319,23 @@ class WaybackDownloader:
         if not self.corrupted_fonts:
             return css
         
-        # For each corrupted font, remove its references from CSS
-        for corrupted_font_url in self.corrupted_fonts:
-            # Extract just the filename from the URL
-            parsed = urlparse(corrupted_font_url)
-            font_filename = os.path.basename(parsed.path)
-            # Also get the path relative to domain (for matching in CSS)
-            font_path = parsed.path.lstrip('/')
-            
-            if not font_filename:
-                continue
-            
-            # Remove url() references to this font file
-            # CSS might have relative paths like /templates/.../fontname.ext
-            # We need to match the path as it appears in CSS (usually relative to root)
-            # The font_path is like "templates/shaper_fixter/fonts/fa-brands-400.eot"
-            # But CSS might have "/templates/shaper_fixter/fonts/fa-brands-400.eot"
-            
-            # Try matching with leading slash
-            css_path_with_slash = '/' + font_path
-            # Try matching without leading slash (already handled by font_path)
-            
-            patterns = [
-                # Match full path with leading slash: url(/templates/.../fontname.ext)
-                rf'url\s*\(\s*["\']?[^"\']*{re.escape(css_path_with_slash)}["\']?\s*\)',
-                # Match full path without leading slash
-                rf'url\s*\(\s*["\']?[^"\']*{re.escape(font_path)}["\']?\s*\)',
-                # Match just filename: url(...fontname.ext)
-                rf'url\s*\(\s*["\']?[^"\']*{re.escape(font_filename)}["\']?\s*\)',
-                # Match with format: url(...fontname.ext) format("...")
-                rf'url\s*\(\s*["\']?[^"\']*{re.escape(font_filename)}["\']?\s*\)\s+format\s*\([^)]+\)',
-                # Match with format and full path (with slash)
-                rf'url\s*\(\s*["\']?[^"\']*{re.escape(css_path_with_slash)}["\']?\s*\)\s+format\s*\([^)]+\)',
-                # Match with format and full path (without slash)
-                rf'url\s*\(\s*["\']?[^"\']*{re.escape(font_path)}["\']?\s*\)\s+format\s*\([^)]+\)',
-            ]
-            
-            for pattern in patterns:
-                css = re.sub(pattern, '', css, flags=re.IGNORECASE)
-            
-            # Also remove standalone src:url(...fontname.ext); lines
-            css = re.sub(rf'src:\s*url\s*\(\s*["\']?[^"\']*{re.escape(font_filename)}["\']?\s*\)\s*;', '', css, flags=re.IGNORECASE)
-            css = re.sub(rf'src:\s*url\s*\(\s*["\']?[^"\']*{re.escape(css_path_with_slash)}["\']?\s*\)\s*;', '', css, flags=re.IGNORECASE)
-            css = re.sub(rf'src:\s*url\s*\(\s*["\']?[^"\']*{re.escape(font_path)}["\']?\s*\)\s*;', '', css, flags=re.IGNORECASE)
+        # Match url() references by file name - CSS might use the full path
+        # (/templates/.../fontname.ext), a relative one, or just the file name,
+        # and all of them end with it
+        font_filenames = {os.path.basename(_urlparse(font_url).path) for font_url in self.corrupted_fonts}
+        font_filenames.discard('')
         
-        # Clean up any double commas or trailing commas
-        css = re.sub(r',\s*,+', ',', css)  # Multiple commas
-        css = re.sub(r',\s*}', '}', css)  # Trailing comma before }
-        css = re.sub(r'src:\s*,', 'src:', css)  # src: with leading comma
-        css = re.sub(r'src:\s*;', '', css)  # Empty src:;
+        # One pass for all corrupted fonts, taking the separating comma and the
+        # format() hint along so the remaining src list stays valid
+        if font_filenames:
+            alternatives = '|'.join(re.escape(name) for name in sorted(font_filenames))
+            pattern = re.compile(
+                rf'(?:,\s*)?url\s*\(\s*["\']?[^"\')]*(?:{alternatives})["\']?\s*\)\s*(?:format\s*\([^)]+\))?',
+                re.IGNORECASE,
+            )
+            css = pattern.sub('', css)
         
-        return css
+        return _cleanup_font_src(css)
     
     def _remove_legacy_font_formats_from_css(self, css: str) -> str:
         """Remove .eot and .svg font format references from CSS.
@@ -854,44 +1343,55 @@ class WaybackDownloader:
         These legacy formats are often corrupted (HTML error pages) in Wayback Machine,
         and modern browsers don't need them - they'll use .woff2, .woff, and .ttf.
         """
+        lowered = css.lower()
+
         # Remove .eot references (with or without format)
-        css = re.sub(r',\s*url\s*\(\s*["\']?[^"\']*\.eot["\']?\s*\)\s*(?:format\s*\([^)]+\))?', '', css, flags=re.IGNORECASE)
-        css = re.sub(r'url\s*\(\s*["\']?[^"\']*\.eot["\']?\s*\)\s*(?:format\s*\([^)]+\))?', '', css, flags=re.IGNORECASE)
-        css = re.sub(r'src:\s*url\s*\(\s*["\']?[^"\']*\.eot["\']?\s*\)\s*;', '', css, flags=re.IGNORECASE)
+        if '.eot' in lowered:
+            css = _RE_EOT_WITH_COMMA.sub('', css)
+            css = _RE_EOT.sub('', css)
+            css = _RE_EOT_SRC.sub('', css)
         
         # Remove .svg font format references (but keep .svg images)
         # Only remove if it's in a font context (has format("svg") or in @font-face)
-        css = re.sub(r',\s*url\s*\(\s*["\']?[^"\']*\.svg["\']?\s*\)\s+format\s*\(["\']?svg["\']?\)', '', css, flags=re.IGNORECASE)
-        css = re.sub(r'url\s*\(\s*["\']?[^"\']*\.svg["\']?\s*\)\s+format\s*\(["\']?svg["\']?\)', '', css, flags=re.IGNORECASE)
+        if '.svg' in lowered:
+            css = _RE_SVG_FONT_WITH_COMMA.sub('', css)
+            css = _RE_SVG_FONT.sub('', css)
         
-        # Clean up any double commas or trailing commas
-        css = re.sub(r',\s*,+', ',', css)  # Multiple commas
-        css = re.sub(r',\s*}', '}', css)  # Trailing comma before }
-        css = re.sub(r'src:\s*,', 'src:', css)  # src: with leading comma
-        css = re.sub(r'src:\s*;', '', css)  # Empty src:;
-        
-        return css
+        return _cleanup_font_src(css)
     
     def _minify_css(self, content: str) -> str:
         """Minify CSS."""
-        if not self.config.minify_css:
+        if not self.config.minify_css or _cssmin is None:
             return content
 
         try:
-            import cssmin
-
-            return cssmin.cssmin(content)
+            return _cssmin(content)
         except Exception as e:
             print(f"Error minifying CSS: {e}")
             return content
 
     def _extract_css_urls(self, css: str, base_url: str) -> List[str]:
         """Extract URLs from CSS content."""
+        make_non_www, make_www = self.config.make_non_www, self.config.make_www
+        if len(css) > self.CSS_CACHE_MAX_CHARS:
+            return self._extract_css_urls_uncached(css, base_url, make_non_www, make_www)
+        # Pages repeat the same inline style across many elements
+        return list(self._css_urls_cache(css, base_url, make_non_www, make_www))
+
+    def _extract_css_urls_uncached(self, css: str, base_url: str, make_non_www: bool, make_www: bool) -> List[str]:
+        """Uncached implementation of _extract_css_urls.
+
+        The www settings are passed in so they form part of the cache key.
+        """
         urls = []
+        lowered = css.lower()
+        has_import = '@import' in lowered
+        has_url = 'url' in lowered
+        if not (has_import or has_url):
+            return urls
         
         # Extract @import URLs
-        import_pattern = r'@import\s+(?:url\()?["\']?([^"\'()]+)["\']?\)?'
-        for match in re.finditer(import_pattern, css, re.IGNORECASE):
+        for match in (_RE_IMPORT.finditer(css) if has_import else ()):
             import_url = match.group(1).strip()
             # Extract from wayback URLs
             original = self._extract_original_url_from_path(import_url)
@@ -901,9 +1401,12 @@ class WaybackDownloader:
             if normalized not in urls:
                 urls.append(normalized)
         
+        # Root-relative references resolve against the stylesheet's origin
+        parsed_base = _urlparse(base_url)
+        base_origin = f"{parsed_base.scheme}://{parsed_base.netloc}"
+        
         # Extract url() references (images, fonts, etc.)
-        url_pattern = r'url\s*\(\s*["\']?([^"\'()]+)["\']?\s*\)'
-        for match in re.finditer(url_pattern, css, re.IGNORECASE):
+        for match in (_RE_URL.finditer(css) if has_url else ()):
             css_url = match.group(1).strip()
             # Skip data URIs and special protocols
             if not css_url.startswith(("data:", "javascript:", "vbscript:", "#")):
@@ -915,9 +1418,7 @@ class WaybackDownloader:
                 # This is critical for font files referenced with relative paths in CSS
                 if css_url.startswith("/") and not css_url.startswith("//"):
                     # Absolute path from domain root - construct full URL
-                    from urllib.parse import urljoin
-                    parsed_base = urlparse(base_url)
-                    css_url = f"{parsed_base.scheme}://{parsed_base.netloc}{css_url}"
+                    css_url = base_origin + css_url
                 normalized = self._normalize_url(css_url, base_url)
                 if normalized not in urls:
                     urls.append(normalized)
@@ -926,27 +1427,35 @@ class WaybackDownloader:
 
     def _rewrite_css_urls(self, css: str, base_url: str) -> str:
         """Rewrite URLs in CSS to relative paths."""
+        # Every url() reference needs an opening parenthesis
+        if '(' not in css:
+            return css
+        
+        # Absolute paths in Google Fonts CSS files are relative to
+        # fonts.gstatic.com, not the site's domain
+        if "fonts.googleapis.com" in base_url:
+            base_origin = "https://fonts.gstatic.com"
+        else:
+            parsed_base = _urlparse(base_url)
+            base_origin = f"{parsed_base.scheme}://{parsed_base.netloc}"
+
         def replace_css_url(match):
             """Rewrite a single CSS url() match to a relative local path."""
             full_match = match.group(0)
-            url_part = match.group(1)
+            url_part = match.group('u')
+            # Only wayback, absolute and root-relative URLs are rewritten;
+            # page-relative paths and data: URIs are left as they are
+            if not url_part.startswith("/") and not url_part[:8].lower().startswith(("http://", "https://")):
+                return full_match
             
             # Extract original URL from wayback path
             original = self._extract_original_url_from_path(url_part)
             if original:
                 url_part = original
             
-            # Handle absolute paths starting with / in Google Fonts CSS files
-            # These are relative to fonts.gstatic.com, not the site's domain
+            # Handle absolute paths starting with /
             if url_part.startswith("/") and not url_part.startswith("//"):
-                # Check if this is a Google Fonts CSS file (base_url contains fonts.googleapis.com)
-                if "fonts.googleapis.com" in base_url:
-                    # Convert to full Google Fonts URL
-                    url_part = f"https://fonts.gstatic.com{url_part}"
-                else:
-                    # Regular absolute path - convert using base_url
-                    parsed_base = urlparse(base_url)
-                    url_part = f"{parsed_base.scheme}://{parsed_base.netloc}{url_part}"
+                url_part = base_origin + url_part
             
             normalized = self._normalize_url(url_part, base_url)
             
@@ -958,25 +1467,7 @@ class WaybackDownloader:
                 if self.config.make_internal_links_relative:
                     # For Google Fonts, construct relative path from the normalized URL
                     if is_google_font:
-                        # Construct path directly from URL to avoid path duplication
-                        parsed_font = urlparse(normalized)
-                        if "fonts.gstatic.com" in parsed_font.netloc:
-                            # Path will be like fonts.gstatic.com/s/montserrat/v29/...
-                            # Check if path already contains the domain (avoid duplication)
-                            font_path = parsed_font.path.lstrip("/")
-                            if font_path.startswith("fonts.gstatic.com"):
-                                relative_path = font_path
-                            else:
-                                relative_path = f"{parsed_font.netloc}/{font_path}"
-                        elif "fonts.googleapis.com" in parsed_font.netloc:
-                            # For Google Fonts CSS files
-                            relative_path = parsed_font.path.lstrip("/")
-                        else:
-                            relative_path = parsed_font.path.lstrip("/")
-                        # Ensure it starts with / for absolute paths
-                        if not relative_path.startswith("/"):
-                            relative_path = "/" + relative_path
-                        new_path = relative_path
+                        new_path = _google_font_relpath(normalized)
                     else:
                         new_path = self._make_relative_path(normalized)
                     return f"url({new_path})"
@@ -984,7 +1475,7 @@ class WaybackDownloader:
             
             # If it's a Squarespace CDN URL, still rewrite it to local path
             if is_squarespace_cdn:
-                parsed_resource = urlparse(normalized)
+                parsed_resource = _urlparse(normalized)
                 resource_path = f"{parsed_resource.netloc}{parsed_resource.path}"
                 # Remove leading slashes
                 while resource_path.startswith("/"):
@@ -995,48 +1486,34 @@ class WaybackDownloader:
             
             return full_match
         
-        # Pattern to match url() with wayback URLs and absolute paths
-        url_patterns = [
-            r'url\s*\(\s*["\']?(https?://web\.archive\.org/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/https?://[^"\'()]+)["\']?\s*\)',  # Absolute wayback (check first)
-            r'url\s*\(\s*["\']?(/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/https?://[^"\'()]+)["\']?\s*\)',  # Relative wayback
-            r'url\s*\(\s*["\']?(https?://[^"\'()]+)["\']?\s*\)',  # Regular URLs
-            r'url\s*\(\s*["\']?(/[^"\'()]+)["\']?\s*\)',  # Absolute paths (for Google Fonts CSS)
-        ]
-        
-        for pattern in url_patterns:
-            css = re.sub(pattern, replace_css_url, css, flags=re.IGNORECASE)
-        
-        return css
+        return _RE_CSS_URL_ANY.sub(replace_css_url, css)
 
     def _extract_js_urls(self, js: str, base_url: str) -> List[str]:
         """Extract URLs from JavaScript content."""
         urls = []
+        # Every accepted URL is absolute or protocol-relative, so contains a slash
+        if "/" not in js:
+            return urls
+        seen = set()
         
-        # More specific patterns to avoid false positives (like code snippets)
-        patterns = [
-            r'(?:fetch|XMLHttpRequest|axios\.get|axios\.post|\.load|\.ajax)\s*\(\s*["\']([^"\']+)["\']',  # Fetch/ajax calls
-            r'\.src\s*=\s*["\']([^"\']+)["\']',  # src assignments
-            r'\.href\s*=\s*["\']([^"\']+)["\']',  # href assignments
-            r'url\s*[:=]\s*["\'](https?://[^"\']+)["\']',  # URL properties
-            r'["\'](https?://[^"\']+\.(?:jpg|jpeg|png|gif|svg|webp|css|js|woff|woff2|ttf|eot|otf)[^"\']*)["\']',  # Asset URLs
-        ]
-        
-        for pattern in patterns:
-            for match in re.finditer(pattern, js):
+        for tokens, pattern in _JS_URL_PATTERNS:
+            if not any(token in js for token in tokens):
+                continue
+            for match in pattern.finditer(js):
                 js_url = match.group(1).strip()
-                # Skip if it looks like code, not a URL
-                if any(skip in js_url for skip in ["function", "return", "if", "else", "var ", "let ", "const "]):
-                    continue
-                if not js_url.startswith(("data:", "javascript:", "vbscript:", "#", "mailto:", "tel:", "//", "http", "https")):
+                # Only absolute and protocol-relative URLs (cheapest check first)
+                if not js_url.startswith(("http://", "https://", "//")):
                     continue
-                if not js_url.startswith(("http://", "https://", "/")):
+                # Skip if it looks like code, not a URL
+                if any(skip in js_url for skip in _JS_CODE_MARKERS):
                     continue
                     
                 original = self._extract_original_url_from_path(js_url)
                 if original:
                     js_url = original
                 normalized = self._normalize_url(js_url, base_url)
-                if normalized not in urls and self._is_internal_url(normalized):
+                if normalized not in seen and self._is_internal_url(normalized):
+                    seen.add(normalized)
                     urls.append(normalized)
         
         return urls
@@ -1047,22 +1524,7 @@ class WaybackDownloader:
             return content
 
         try:
-            from PIL import Image
-            from io import BytesIO
-
-            img = Image.open(BytesIO(content))
-            
-            # Convert RGBA to RGB for JPEG
-            if format.upper() == "JPEG" and img.mode == "RGBA":
-                background = Image.new("RGB", img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[3])
-                img = background
-            elif img.mode not in ("RGB", "L"):
-                img = img.convert("RGB")
-
-            output = BytesIO()
-            img.save(output, format=format, optimize=True, quality=85)
-            return output.getvalue()
+            return _optimize_image_data(content, format)
         except Exception as e:
             print(f"Error optimizing image: {e}")
             return content
@@ -1070,126 +1532,125 @@ class WaybackDownloader:
     def _process_html(self, html: str, base_url: str) -> tuple[str, List[str]]:
         """Process HTML content and extract links."""
         self._current_page_url = base_url
-        soup = BeautifulSoup(html, "lxml")
-        links_to_follow: List[str] = []
-
-        # Remove Wayback Machine banner, scripts, and styles
-        elements_to_remove = []
-        for element in soup.find_all(["iframe", "div", "script", "link"], id=True):
-            if element is None:
-                continue
-            try:
-                element_id = element.get("id")
-                if element_id and any(banner_id in str(element_id).lower() for banner_id in ["wm-ipp", "wm-bipp", "wm-toolbar", "wm-ipp-base"]):
-                    elements_to_remove.append(element)
-            except (AttributeError, TypeError):
+        soup = BeautifulSoup(html, _HTML_PARSER)
+        # Keyed by normalized URL so a resource referenced several times on
+        # the page is queued once, with the first original URL seen
+        links_to_follow: Dict[str, str] = {}
+
+        # Walk the tree once, collecting elements to remove instead of running
+        # a find_all() per rule. Wayback Machine leftovers are removed before
+        # the Static stub is added; trackers, ads and external iframes after.
+        wayback_elements = []
+        unwanted_elements = []
+        comments = []
+        scripts = []
+        remove_trackers = self.config.remove_trackers
+        remove_ads = self.config.remove_ads
+        remove_external_iframes = self.config.remove_external_iframes
+        for element in soup.descendants:
+            if isinstance(element, Comment):
+                comments.append(element)
                 continue
-        for element in elements_to_remove:
-            element.decompose()
-        
-        # Remove wayback machine script tags by src
-        # But preserve cookie consent scripts (cookieyes, etc.) even if they come from external CDNs
-        for script in soup.find_all("script", src=True):
-            src = script.get("src", "")
-            # Preserve cookie consent scripts
-            if "cookieyes" in src.lower() or "cookie-consent" in src.lower():
+            name = element.name
+            if name is None:
                 continue
-            if "web.archive.org" in src or "web-static.archive.org" in src or "bundle-playback.js" in src or "wombat.js" in src or "ruffle.js" in src:
-                script.decompose()
-        
-        # Remove wayback machine link tags by href (but keep internal links that need processing)
-        for link in soup.find_all("link", href=True):
-            if link is None:
-                continue
-            href = link.get("href", "")
-            if not href:
-                continue
-            # Only remove wayback machine banner/styles, not internal assets that need processing
-            if "banner-styles.css" in href or "iconochive.css" in href or "web-static.archive.org" in href:
-                link.decompose()
-            # For /web/ paths, we'll process them below, don't remove here
-        
-        # Remove wayback-specific meta tags and scripts
-        for meta in soup.find_all("meta"):
-            if meta is None:
-                continue
-            meta_property = meta.get("property")
-            meta_content = meta.get("content", "")
-            if meta_property == "og:url" and meta_content and "web.archive.org" in str(meta_content):
-                meta.decompose()
-        
-        # Remove inline wayback scripts (__wm, __wm.wombat, RufflePlayer)
-        for script in soup.find_all("script"):
-            if script.string:
-                script_content = script.string
-                if any(pattern in script_content for pattern in ["__wm", "wombat", "RufflePlayer", "web.archive.org"]):
-                    script.decompose()
+
+            # Wayback Machine banner, scripts, and styles
+            if name in _BANNER_TAGS:
+                element_id = element.get("id")
+                if element_id:
+                    element_id_lower = str(element_id).lower()
+                    if any(banner_id in element_id_lower for banner_id in _BANNER_IDS):
+                        wayback_elements.append(element)
+
+            if name == "script":
+                scripts.append(element)
+                src = element.get("src")
+                if src is not None:
+                    # Remove wayback machine script tags by src
+                    # But preserve cookie consent scripts (cookieyes, etc.) even if they come from external CDNs
+                    src_lower = src.lower()
+                    if "cookieyes" not in src_lower and "cookie-consent" not in src_lower:
+                        if any(marker in src for marker in _WAYBACK_SCRIPT_SRC_MARKERS):
+                            wayback_elements.append(element)
+                    if remove_trackers and src and self._is_tracker(src):
+                        unwanted_elements.append(element)
+                    if remove_ads and self._is_ad(src):
+                        unwanted_elements.append(element)
+                script_content = element.string
+                if script_content:
+                    # Remove inline wayback scripts (__wm, __wm.wombat, RufflePlayer)
+                    if any(marker in script_content for marker in _WAYBACK_SCRIPT_MARKERS):
+                        wayback_elements.append(element)
+                    # Remove inline tracking scripts (Google Analytics, gtag, dataLayer)
+                    # Note: Cookie consent scripts (like cookieyes) are preserved as they're part of site functionality
+                    if remove_trackers:
+                        script_text = script_content.lower()
+                        # Only remove tracking scripts, not cookie consent functionality
+                        if any(marker in script_text for marker in self._inline_tracker_markers):
+                            # Skip cookieyes and cookie consent scripts - preserve them
+                            if "cookieyes" not in script_text and "cookie consent" not in script_text:
+                                unwanted_elements.append(element)
+            elif name == "link":
+                # Remove wayback machine link tags by href (but keep internal links that need processing)
+                href = element.get("href", "")
+                # Only remove wayback machine banner/styles, not internal assets that need processing
+                # For /web/ paths, we'll process them below, don't remove here
+                if href and ("banner-styles.css" in href or "iconochive.css" in href or "web-static.archive.org" in href):
+                    wayback_elements.append(element)
+            elif name == "meta":
+                # Remove wayback-specific meta tags
+                meta_content = element.get("content", "")
+                if element.get("property") == "og:url" and meta_content and "web.archive.org" in str(meta_content):
+                    wayback_elements.append(element)
+            elif name == "iframe" or name == "img":
+                src = element.get("src")
+                if src is not None:
+                    if remove_ads and self._is_ad(src):
+                        unwanted_elements.append(element)
+                    # Remove external iframes
+                    if name == "iframe" and remove_external_iframes and not self._is_internal_url(src):
+                        unwanted_elements.append(element)
+
+        for element in wayback_elements:
+            if not element.decomposed:
+                element.decompose()
+        scripts = [script for script in scripts if not script.decomposed]
         
         # Add Static object stub if needed (for Squarespace sites)
         # Check if any script references Static but it's not defined
         needs_static_stub = False
-        for script in soup.find_all("script"):
+        for script in scripts:
             if script.string and ("Static." in script.string or "window.Static" in script.string):
                 needs_static_stub = True
                 break
         
         if needs_static_stub:
             # Find the first script tag and add stub before it, or add after SQUARESPACE_ROLLUPS if present
-            first_script = soup.find("script")
-            if first_script:
-                static_stub = soup.new_string("\n")
-                static_script = soup.new_tag("script")
-                static_script.string = "window.Static = window.Static || {}; window.Static.SQUARESPACE_CONTEXT = window.Static.SQUARESPACE_CONTEXT || { showAnnouncementBar: false };"
-                # Try to insert after SQUARESPACE_ROLLUPS script if it exists
-                rollups_script = None
-                for script in soup.find_all("script"):
-                    if script.string and "SQUARESPACE_ROLLUPS" in script.string:
-                        rollups_script = script
-                        break
-                if rollups_script:
-                    rollups_script.insert_after(static_script)
-                else:
-                    first_script.insert_before(static_script)
+            first_script = scripts[0]
+            static_script = soup.new_tag("script")
+            static_script.string = "window.Static = window.Static || {}; window.Static.SQUARESPACE_CONTEXT = window.Static.SQUARESPACE_CONTEXT || { showAnnouncementBar: false };"
+            # Try to insert after SQUARESPACE_ROLLUPS script if it exists
+            rollups_script = None
+            for script in scripts:
+                if script.string and "SQUARESPACE_ROLLUPS" in script.string:
+                    rollups_script = script
+                    break
+            if rollups_script:
+                rollups_script.insert_after(static_script)
+            else:
+                first_script.insert_before(static_script)
         
         # Remove comments
-        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-            comment.extract()
-
-        # Remove trackers and analytics
-        if self.config.remove_trackers:
-            for script in soup.find_all("script", src=True):
-                if script is None:
-                    continue
-                script_src = script.get("src")
-                if script_src and self._is_tracker(script_src):
-                    script.decompose()
-
-            # Remove inline tracking scripts (Google Analytics, gtag, dataLayer)
-            # Note: Cookie consent scripts (like cookieyes) are preserved as they're part of site functionality
-            for script in soup.find_all("script"):
-                if script.string:
-                    script_text = script.string.lower()
-                    # Only remove tracking scripts, not cookie consent functionality
-                    if any(pattern in script_text for pattern in self.TRACKER_PATTERNS + [
-                        "gtag", "datalayer", "google-analytics"
-                    ]):
-                        # Skip cookieyes and cookie consent scripts - preserve them
-                        if "cookieyes" not in script_text and "cookie consent" not in script_text:
-                            script.decompose()
-            
-            # Note: Cookie popups and consent UI are preserved - they're part of site functionality
-
-        # Remove ads
-        if self.config.remove_ads:
-            for element in soup.find_all(["script", "iframe", "img"], src=True):
-                if self._is_ad(element["src"]):
-                    element.decompose()
+        for comment in comments:
+            if not comment.decomposed:
+                comment.extract()
 
-        # Remove external iframes
-        if self.config.remove_external_iframes:
-            for iframe in soup.find_all("iframe", src=True):
-                if not self._is_internal_url(iframe["src"]):
-                    iframe.decompose()
+        # Remove trackers and analytics, ads and external iframes
+        # Note: Cookie popups and consent UI are preserved - they're part of site functionality
+        for element in unwanted_elements:
+            if not element.decomposed:
+                element.decompose()
 
         # Process frames (<frame src="...">) and internal iframes
         # Frame-based pages (using <frameset>/<frame>) won't render without their frame content
@@ -1214,7 +1675,26 @@ class WaybackDownloader:
                     frame["src"] = normalized_url
 
                 if normalized_url not in self.config.visited_urls:
-                    links_to_follow.append(original_url)
+                    links_to_follow.setdefault(normalized_url, original_url)
+
+        # Collect links inside floating button containers and icon groups up
+        # front, so each link needs a set lookup instead of walking its ancestors
+        floating_link_ids: Set[int] = set()
+        icon_group_link_ids: Set[int] = set()
+        for container in soup.find_all(True):
+            container_classes = container.get("class")
+            if isinstance(container_classes, list):
+                container_classes = " ".join(container_classes)
+            container_classes = str(container_classes).lower() if container_classes else ""
+            container_id = container.get("id", "")
+            is_floating = "botonesflotantes" in container_classes or (container_id and "sp-footeredu" in str(container_id))
+            is_icon_group = "icons-group" in container_classes
+            if is_floating or is_icon_group:
+                for descendant in container.find_all("a"):
+                    if is_floating:
+                        floating_link_ids.add(id(descendant))
+                    if is_icon_group:
+                        icon_group_link_ids.add(id(descendant))
 
         # Process links
         for link in soup.find_all("a", href=True):
@@ -1225,30 +1705,14 @@ class WaybackDownloader:
                 continue
             
             # Check if this link is inside a floating buttons container BEFORE processing
-            is_floating_button = False
-            parent_classes = []
-            parent = link.find_parent()
-            while parent and parent.name:  # parent.name checks if it's a valid tag
-                parent_class = parent.get("class")
-                if parent_class:
-                    if isinstance(parent_class, list):
-                        parent_classes.extend(parent_class)
-                    else:
-                        parent_classes.append(str(parent_class))
-                parent_id = parent.get("id", "")
-                if parent_id and "sp-footeredu" in str(parent_id):
-                    is_floating_button = True
-                parent = parent.find_parent()
-            
-            is_floating_button = is_floating_button or any("botonesflotantes" in str(cls).lower() for cls in parent_classes)
+            is_floating_button = id(link) in floating_link_ids
             
             # For floating button links, preserve them as-is (don't process wayback URLs)
             if is_floating_button:
                 # Extract wayback URL from href if present, but preserve tel:/mailto: protocols
                 if href.startswith("https://web.archive.org/web/") or href.startswith("http://web.archive.org/web/") or href.startswith("/web/"):
                     # Extract protocol-relative URL from wayback path (e.g., /web/TIMESTAMP/tel:xxx)
-                    wayback_protocol_pattern = r"/web/\d+[a-z]*/(tel:|mailto:|whatsapp:)(.+)"
-                    match = re.search(wayback_protocol_pattern, href)
+                    match = _RE_WB_CONTACT_PROTO.search(href)
                     if match:
                         protocol = match.group(1)
                         path = match.group(2)
@@ -1260,13 +1724,9 @@ class WaybackDownloader:
                     else:
                         # Check if it's a direct mailto: link in wayback URL
                         # Handle both relative (/web/TIMESTAMP/mailto:...) and absolute (https://web.archive.org/web/TIMESTAMP/mailto:...)
-                        mailto_direct_patterns = [
-                            r"/web/\d+[a-z]*/(mailto:[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
-                            r"https?://web\.archive\.org/web/\d+[a-z]*/(mailto:[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"
-                        ]
                         mailto_extracted = False
-                        for pattern in mailto_direct_patterns:
-                            mailto_direct_match = re.search(pattern, href)
+                        for pattern in _RE_WB_MAILTO:
+                            mailto_direct_match = pattern.search(href)
                             if mailto_direct_match:
                                 href = mailto_direct_match.group(1)
                                 link["href"] = href
@@ -1276,8 +1736,7 @@ class WaybackDownloader:
                         if not mailto_extracted:
                             # Check if it's an email address hidden in an https:// URL
                             # Pattern: /web/TIMESTAMP/https://domain.com/email@domain.com
-                            mailto_pattern = r"/web/\d+[a-z]*/https?://[^/]+/([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"
-                            mailto_match = re.search(mailto_pattern, href)
+                            mailto_match = _RE_WB_HIDDEN_EMAIL.search(href)
                             if mailto_match:
                                 email = mailto_match.group(1)
                                 href = f"mailto:{email}"
@@ -1305,26 +1764,13 @@ class WaybackDownloader:
             # Keep original URL with query strings for downloading - normalize later for file paths
             original_url = href
             # Normalize only for checking if internal/external
-            parsed_original = urlparse(original_url)
-            normalized_for_check = parsed_original._replace(fragment="", query="").geturl()
+            normalized_for_check = _strip_query(original_url)
             # Check if internal using normalized version
             is_internal = self._is_internal_url(normalized_for_check)
 
             # Handle contact links (but preserve floating buttons and icon groups - already handled above)
             # Check if link is in an icon group before removing contact links
-            parent = link.parent
-            is_in_icon_group = False
-            while parent is not None:
-                parent_classes = parent.get("class", [])
-                if parent_classes:
-                    if isinstance(parent_classes, list):
-                        parent_classes_str = " ".join(parent_classes)
-                    else:
-                        parent_classes_str = str(parent_classes)
-                    if "sppb-icons-group-list" in parent_classes_str or "icons-group" in parent_classes_str.lower():
-                        is_in_icon_group = True
-                        break
-                parent = parent.parent if hasattr(parent, 'parent') else None
+            is_in_icon_group = id(link) in icon_group_link_ids
             
             if self.config.remove_clickable_contacts and self._is_contact_link(original_url) and not is_floating_button and not is_in_icon_group:
                 if self.config.remove_external_links_remove_anchors:
@@ -1362,21 +1808,6 @@ class WaybackDownloader:
                     continue
                 
                 # Preserve links in icon groups (sppb-icons-group-list) - these are social media icons
-                # Check if the link is inside an icon group list
-                parent = link.parent
-                is_in_icon_group = False
-                while parent is not None:
-                    parent_classes = parent.get("class", [])
-                    if parent_classes:
-                        if isinstance(parent_classes, list):
-                            parent_classes_str = " ".join(parent_classes)
-                        else:
-                            parent_classes_str = str(parent_classes)
-                        if "sppb-icons-group-list" in parent_classes_str or "icons-group" in parent_classes_str.lower():
-                            is_in_icon_group = True
-                            break
-                    parent = parent.parent if hasattr(parent, 'parent') else None
-                
                 if is_in_icon_group:
                     # Preserve icon group links - just clean up the href (remove wayback prefix)
                     link["href"] = original_url
@@ -1404,7 +1835,7 @@ class WaybackDownloader:
             # Add to links to follow - use original URL with query strings for downloading
             # Track by normalized URL to avoid downloading same file multiple times
             if normalized_url not in self.config.visited_urls:
-                links_to_follow.append(original_url)
+                links_to_follow.setdefault(normalized_url, original_url)
 
         # Process images
         for img in soup.find_all("img", src=True):
@@ -1428,7 +1859,7 @@ class WaybackDownloader:
                     # Images are assets, don't add .html extension
                     if is_squarespace_cdn:
                         # For Squarespace CDN, preserve domain structure
-                        parsed_img = urlparse(normalized_url)
+                        parsed_img = _urlparse(normalized_url)
                         img_path = f"{parsed_img.netloc}{parsed_img.path}"
                         # Remove leading slashes
                         while img_path.startswith("/"):
@@ -1440,7 +1871,7 @@ class WaybackDownloader:
                     img["src"] = normalized_url
 
                 if normalized_url not in self.config.visited_urls:
-                    links_to_follow.append(original_url)
+                    links_to_follow.setdefault(normalized_url, original_url)
 
         # Process HTML background attributes (legacy <body>, <table>, <td>, <tr>, <th>)
         for elem in soup.find_all(["body", "table", "td", "tr", "th"], attrs={"background": True}):
@@ -1458,7 +1889,7 @@ class WaybackDownloader:
                 else:
                     elem["background"] = normalized_url
                 if normalized_url not in self.config.visited_urls:
-                    links_to_follow.append(original_url)
+                    links_to_follow.setdefault(normalized_url, original_url)
 
         # Process picture/source tags for responsive images
         for picture in soup.find_all("picture"):
@@ -1475,7 +1906,7 @@ class WaybackDownloader:
                         continue
                     # Split URL and descriptor (e.g., "url 500w" or "url?format=100w 100w")
                     # Descriptor is at the end: space followed by number and 'w' or 'x'
-                    parts = re.split(r'\s+(\d+(?:\.\d+)?[xw])$', item, maxsplit=1)
+                    parts = _RE_SRCSET_DESCRIPTOR.split(item, maxsplit=1)
                     if len(parts) == 3:
                         url_part, descriptor, _ = parts
                         descriptor = f" {descriptor}"
@@ -1488,7 +1919,7 @@ class WaybackDownloader:
                     original = self._extract_original_url_from_path(url_part)
                     if not original and "web.archive.org" in url_part:
                         # Try to extract from absolute wayback URL - match the full URL including query strings
-                        wayback_match = re.search(r'/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/(https?://[^\s"\'<>\)]+)', url_part)
+                        wayback_match = _RE_SRCSET_WAYBACK.search(url_part)
                         if wayback_match:
                             original = wayback_match.group(1)
                     
@@ -1500,12 +1931,12 @@ class WaybackDownloader:
                     
                     # Queue for download if internal or Squarespace CDN
                     if (self._is_internal_url(normalized_srcset) or is_squarespace_cdn) and normalized_srcset not in self.config.visited_urls:
-                        links_to_follow.append(url_part)
+                        links_to_follow.setdefault(normalized_srcset, url_part)
                     
                     # Rewrite to local path
                     if self._is_internal_url(normalized_srcset) or is_squarespace_cdn:
                         if is_squarespace_cdn:
-                            parsed_resource = urlparse(normalized_srcset)
+                            parsed_resource = _urlparse(normalized_srcset)
                             resource_path = f"{parsed_resource.netloc}{parsed_resource.path}"
                             # Preserve query string if present
                             if parsed_resource.query:
@@ -1536,12 +1967,12 @@ class WaybackDownloader:
                 normalized_url = self._normalize_url(src, base_url)
                 is_squarespace_cdn = self._is_squarespace_cdn(normalized_url) or self._is_squarespace_cdn(original_src)
                 if (self._is_internal_url(normalized_url) or is_squarespace_cdn) and normalized_url not in self.config.visited_urls:
-                    links_to_follow.append(src)
+                    links_to_follow.setdefault(normalized_url, src)
                 # Rewrite img src in picture tags
                 if self._is_internal_url(normalized_url) or is_squarespace_cdn:
                     if self.config.make_internal_links_relative:
                         if is_squarespace_cdn:
-                            parsed_img = urlparse(normalized_url)
+                            parsed_img = _urlparse(normalized_url)
                             img_path = f"{parsed_img.netloc}{parsed_img.path}"
                             while img_path.startswith("/"):
                                 img_path = img_path[1:]
@@ -1584,19 +2015,18 @@ class WaybackDownloader:
                         original_resource_url = href if (is_google_font and "fonts.googleapis.com" in href) or (is_squarespace_cdn and self._is_squarespace_cdn(href)) else None
                     if original_resource_url:
                         # Normalize for tracking (remove query strings for visited check)
-                        parsed_resource = urlparse(original_resource_url)
-                        normalized_resource = parsed_resource._replace(fragment="", query="").geturl()
+                        parsed_resource = _urlparse(original_resource_url)
+                        normalized_resource = _strip_query(original_resource_url)
                         # Add to queue to download from Wayback Machine
-                        if normalized_resource not in self.config.visited_urls:
-                            links_to_follow.append(original_resource_url)
+                        if normalized_resource not in self.config.visited_urls and normalized_resource not in links_to_follow:
+                            links_to_follow[normalized_resource] = original_resource_url
                             resource_type = "Google Fonts CSS" if is_google_font else "Squarespace CDN"
-                            print(f"         📥 Queued {resource_type} for download: {original_resource_url[:80]}...", flush=True)
+                            self._log(f"         📥 Queued {resource_type} for download: {original_resource_url[:80]}...")
                         # Convert to local path immediately so HTML references local file
                         # Use _get_local_path to determine where the file will be saved
                         if is_google_font:
                             # For Google Fonts, create a path like /fonts.googleapis.com/css.css
-                            import hashlib
-                            query_hash = hashlib.md5(parsed_resource.query.encode()).hexdigest()[:8]
+                            query_hash = _short_hash(parsed_resource.query)
                             resource_path = f"fonts.googleapis.com/css-{query_hash}.css"
                         else:
                             # For Squarespace CDN, preserve domain structure
@@ -1628,7 +2058,7 @@ class WaybackDownloader:
                 link["href"] = normalized_url
 
             if normalized_url not in self.config.visited_urls:
-                links_to_follow.append(original_url)
+                links_to_follow.setdefault(normalized_url, original_url)
 
         # Process script tags
         for script in soup.find_all("script", src=True):
@@ -1654,7 +2084,7 @@ class WaybackDownloader:
                     script["src"] = normalized_url
 
                 if normalized_url not in self.config.visited_urls:
-                    links_to_follow.append(original_url)
+                    links_to_follow.setdefault(normalized_url, original_url)
 
         # Process SVG use elements with xlink:href attributes
         for use_elem in soup.find_all("use"):
@@ -1705,7 +2135,7 @@ class WaybackDownloader:
             if self._is_internal_url(normalized_url) or is_squarespace_cdn:
                 if self.config.make_internal_links_relative:
                     if is_squarespace_cdn:
-                        parsed_asset = urlparse(normalized_url)
+                        parsed_asset = _urlparse(normalized_url)
                         asset_path = f"{parsed_asset.netloc}{parsed_asset.path}"
                         if parsed_asset.query:
                             asset_path += "?" + parsed_asset.query
@@ -1718,92 +2148,80 @@ class WaybackDownloader:
                     link["href"] = normalized_url
 
                 if normalized_url not in self.config.visited_urls:
-                    links_to_follow.append(normalized_url)
-
-        # Process inline styles (background-image, etc.)
-        for element in soup.find_all(style=True):
-            style = element["style"]
-            # Extract URLs from inline styles
-            style_urls = self._extract_css_urls(style, base_url)
-            for style_url in style_urls:
-                is_squarespace_cdn = self._is_squarespace_cdn(style_url)
-                if style_url not in self.config.visited_urls and (self._is_internal_url(style_url) or is_squarespace_cdn):
-                    links_to_follow.append(style_url)
+                    links_to_follow.setdefault(normalized_url, normalized_url)
+
+        def replace_url_in_style(match):
+            """Rewrite a single url() inside an inline style attribute."""
+            full_match = match.group(0)
+            url_part = match.group(1) if len(match.groups()) > 0 else full_match
             
-            # Rewrite URLs in inline styles - handle url() functions
-            if "web.archive.org" in style or "/web/" in style or "url(" in style:
-                def replace_url_in_style(match):
-                    """Rewrite a single url() inside an inline style attribute."""
-                    full_match = match.group(0)
-                    url_part = match.group(1) if len(match.groups()) > 0 else full_match
-                    
-                    # Extract original URL from wayback path
-                    original = self._extract_original_url_from_path(url_part)
-                    if original:
-                        url_part = original
-                    elif "web.archive.org" in url_part:
-                        # Try extracting from absolute wayback URL
-                        match_obj = re.search(r"/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/(https?://[^\"\s'()]+)", url_part)
-                        if match_obj:
-                            url_part = match_obj.group(1)
-                    
-                    normalized = self._normalize_url(url_part, base_url)
-                    is_squarespace_cdn = self._is_squarespace_cdn(normalized)
-                    
-                    if self._is_internal_url(normalized) or is_squarespace_cdn:
-                        if self.config.make_internal_links_relative:
-                            if is_squarespace_cdn:
-                                parsed_resource = urlparse(normalized)
-                                resource_path = f"{parsed_resource.netloc}{parsed_resource.path}"
-                                while resource_path.startswith("/"):
-                                    resource_path = resource_path[1:]
-                                new_path = self._to_relative_path(f"/{resource_path}")
-                            else:
-                                new_path = self._make_relative_path(normalized)
-                            return f"url({new_path})"
-                        return f"url({normalized})"
-                    
-                    return full_match
-                
-                # Pattern for url() with wayback URLs in inline styles
-                url_patterns = [
-                    r'url\s*\(\s*["\']?(/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/https?://[^"\'()]+)["\']?\s*\)',  # Relative wayback
-                    r'url\s*\(\s*["\']?(https?://web\.archive\.org/web/\d+[a-z]*(?:im_|cs_|js_|jm_)/https?://[^"\'()]+)["\']?\s*\)',  # Absolute wayback
-                    r'url\s*\(\s*["\']?(https?://web\.archive\.org/[^"\'()]+)["\']?\s*\)',  # Simple web.archive.org URL
-                ]
-                new_style = style
-                for pattern in url_patterns:
-                    new_style = re.sub(pattern, replace_url_in_style, new_style, flags=re.IGNORECASE)
-                # Remove references to corrupted fonts from inline styles
-                new_style = self._remove_corrupted_fonts_from_css(new_style)
-                element["style"] = new_style
+            # Extract original URL from wayback path
+            original = self._extract_original_url_from_path(url_part)
+            if original:
+                url_part = original
+            elif "web.archive.org" in url_part:
+                # Try extracting from absolute wayback URL
+                match_obj = _RE_STYLE_WAYBACK.search(url_part)
+                if match_obj:
+                    url_part = match_obj.group(1)
+            
+            normalized = self._normalize_url(url_part, base_url)
+            is_squarespace_cdn = self._is_squarespace_cdn(normalized)
+            
+            if self._is_internal_url(normalized) or is_squarespace_cdn:
+                if self.config.make_internal_links_relative:
+                    if is_squarespace_cdn:
+                        parsed_resource = _urlparse(normalized)
+                        resource_path = f"{parsed_resource.netloc}{parsed_resource.path}"
+                        while resource_path.startswith("/"):
+                            resource_path = resource_path[1:]
+                        new_path = self._to_relative_path(f"/{resource_path}")
+                    else:
+                        new_path = self._make_relative_path(normalized)
+                    return f"url({new_path})"
+                return f"url({normalized})"
+            
+            return full_match
 
-        # Process <style> tags in HTML (not just inline styles)
-        for style_tag in soup.find_all("style"):
-            if style_tag.string:
-                css_content = style_tag.string
-                # Extract URLs from style tag content
-                style_urls = self._extract_css_urls(css_content, base_url)
+        parsed_base = _urlparse(base_url)
+        base_domain = parsed_base.netloc.lower().removeprefix("www.")
+        domain = self.config.domain
+
+        # Inline styles, data-* attributes and remaining domain references are
+        # handled in one walk over all elements. Each step only touches the
+        # element's own attributes and sees the previous step's rewrites.
+        for element in soup.find_all(True):  # All elements
+            if not element.attrs:
+                continue
+
+            # Process inline styles (background-image, etc.)
+            style = element.get("style")
+            if style is not None:
+                # Extract URLs from inline styles
+                style_urls = self._extract_css_urls(style, base_url)
                 for style_url in style_urls:
                     is_squarespace_cdn = self._is_squarespace_cdn(style_url)
                     if style_url not in self.config.visited_urls and (self._is_internal_url(style_url) or is_squarespace_cdn):
-                        links_to_follow.append(style_url)
+                        links_to_follow.setdefault(style_url, style_url)
                 
-                # Rewrite URLs in style tag CSS
-                css_content = self._rewrite_css_urls(css_content, base_url)
-                # Remove references to corrupted fonts
-                css_content = self._remove_corrupted_fonts_from_css(css_content)
-                style_tag.string = css_content
+                # Rewrite URLs in inline styles - handle url() functions
+                if "web.archive.org" in style or "/web/" in style or "url(" in style:
+                    new_style = style
+                    for pattern in _RE_STYLE_WAYBACK_URLS:
+                        new_style = pattern.sub(replace_url_in_style, new_style)
+                    # Remove references to corrupted fonts from inline styles
+                    new_style = self._remove_corrupted_fonts_from_css(new_style)
+                    element["style"] = new_style
 
-        # Process data-* attributes that contain URLs (e.g., data-video_src, data-src, data-href, etc.)
-        # Convert domain URLs to relative paths to match Wayback Machine behavior
-        for element in soup.find_all(True):  # All elements
-            if not hasattr(element, 'attrs') or not element.attrs:
-                continue
-            for attr_name, attr_value in element.attrs.items():
-                if attr_name.startswith('data-') and isinstance(attr_value, str):
+            for attr_name, attr_value in list(element.attrs.items()):
+                if not isinstance(attr_value, str):
+                    continue
+
+                # Process data-* attributes that contain URLs (e.g., data-video_src, data-src, data-href, etc.)
+                # Convert domain URLs to relative paths to match Wayback Machine behavior
+                if attr_name.startswith('data-'):
                     # Check if attribute contains a domain URL
-                    if (self.config.domain and self.config.domain in attr_value) or self._is_squarespace_cdn(attr_value):
+                    if (domain and domain in attr_value) or self._is_squarespace_cdn(attr_value):
                         # Extract original URL if it's a wayback path
                         original = self._extract_original_url_from_path(attr_value)
                         if original:
@@ -1815,7 +2233,7 @@ class WaybackDownloader:
                         if (self._is_internal_url(normalized) or is_squarespace_cdn) and self.config.make_internal_links_relative:
                             # Convert to relative path
                             if is_squarespace_cdn:
-                                parsed_asset = urlparse(normalized)
+                                parsed_asset = _urlparse(normalized)
                                 asset_path = f"{parsed_asset.netloc}{parsed_asset.path}"
                                 if parsed_asset.query:
                                     asset_path += "?" + parsed_asset.query
@@ -1828,15 +2246,13 @@ class WaybackDownloader:
                         elif self._is_internal_url(normalized) or is_squarespace_cdn:
                             # Keep normalized URL but ensure it uses the correct scheme
                             element[attr_name] = normalized
+                        attr_value = element[attr_name]
 
-        # Convert any remaining domain references in text content and attributes to relative paths
-        # This handles cases where domain URLs appear in href, src, or other attributes
-        parsed_base = urlparse(base_url)
-        base_domain = parsed_base.netloc.lower().lstrip("www.")
-        
-        for element in soup.find_all(True):  # All elements
-            for attr_name, attr_value in list(element.attrs.items()):
-                if isinstance(attr_value, str) and (base_domain in attr_value.lower() or self._is_squarespace_cdn(attr_value) or "web.archive.org" in attr_value or attr_value.startswith("/web/")):
+                # Convert any remaining domain references to relative paths
+                # This handles cases where domain URLs appear in href, src, or other attributes
+                # Cheap case-sensitive checks first; most Wayback references match
+                # here without building a lowercased copy of the value
+                if "web.archive.org" in attr_value or attr_value.startswith("/web/") or base_domain in attr_value.lower() or self._is_squarespace_cdn(attr_value):
                     # Check if it's a full URL with the domain or a Squarespace CDN URL
                     is_squarespace_cdn = self._is_squarespace_cdn(attr_value)
                     if attr_value.startswith(("http://", "https://", "/web/")) or is_squarespace_cdn or "web.archive.org" in attr_value:
@@ -1850,7 +2266,7 @@ class WaybackDownloader:
                         is_sqcdn_norm = self._is_squarespace_cdn(normalized)
                         if (self._is_internal_url(normalized) or is_sqcdn_norm) and self.config.make_internal_links_relative:
                             if is_sqcdn_norm:
-                                parsed_asset = urlparse(normalized)
+                                parsed_asset = _urlparse(normalized)
                                 asset_path = f"{parsed_asset.netloc}{parsed_asset.path}"
                                 if parsed_asset.query:
                                     asset_path += "?" + parsed_asset.query
@@ -1863,20 +2279,48 @@ class WaybackDownloader:
                         elif self._is_internal_url(normalized) or is_sqcdn_norm:
                             element[attr_name] = normalized
 
+        # Process <style> tags in HTML (not just inline styles)
+        for style_tag in soup.find_all("style"):
+            if style_tag.string:
+                css_content = style_tag.string
+                # Extract URLs from style tag content
+                style_urls = self._extract_css_urls(css_content, base_url)
+                for style_url in style_urls:
+                    is_squarespace_cdn = self._is_squarespace_cdn(style_url)
+                    if style_url not in self.config.visited_urls and (self._is_internal_url(style_url) or is_squarespace_cdn):
+                        links_to_follow.setdefault(style_url, style_url)
+                
+                # Rewrite URLs in style tag CSS
+                css_content = self._rewrite_css_urls(css_content, base_url)
+                # Remove references to corrupted fonts
+                css_content = self._remove_corrupted_fonts_from_css(css_content)
+                style_tag.string = css_content
+
         # Get processed HTML
         processed_html = str(soup)
         processed_html = self._optimize_html(processed_html)
 
-        return processed_html, links_to_follow
+        return processed_html, list(links_to_follow.values())
 
     def download(self):
         """Main download method."""
-        # Create output directory
-        Path(self.config.output_dir).mkdir(parents=True, exist_ok=True)
-
-        # Start with the main page
-        queue = [self.config.base_url]
-        files_downloaded = 0
+        # Pick up any config changes made after init, then create output directory
+        self.refresh_config()
+        self._output_root.mkdir(parents=True, exist_ok=True)
+
+        # Start with the main page. Queued URLs are also tracked by their
+        # normalized form (no query or fragment) so membership checks are O(1)
+        queue = deque([self.config.base_url])
+        queued = {_strip_query(self.config.base_url)}
+        # Downloads already started for URLs further down the queue
+        prefetched: Dict[str, object] = {}
+        # Without per-file lines, show a single progress bar when available
+        progress = None
+        if not self.config.verbose and tqdm is not None:
+            progress = tqdm(total=self.config.max_files, unit="file")
+        # Fetched files count towards MAX_FILES; saved files are counted at the end
+        files_fetched = 0
+        files_saved_before = len(self.config.downloaded_files)
         files_failed = 0
         files_skipped = 0
 
@@ -1889,335 +2333,318 @@ class WaybackDownloader:
             print(f"⚠️  TEST MODE: Limited to {self.config.max_files} files", flush=True)
         print(f"{'='*70}\n", flush=True)
 
-        while queue:
-            # Check if we've reached the file limit (for testing)
-            if self.config.max_files and files_downloaded >= self.config.max_files:
-                print(f"\n{'='*70}", flush=True)
-                print(f"⚠️  Reached MAX_FILES limit ({self.config.max_files}) - stopping download", flush=True)
-                print(f"{'='*70}", flush=True)
-                break
+        try:
+            while queue:
+                # Check if we've reached the file limit (for testing)
+                if self.config.max_files and files_fetched >= self.config.max_files:
+                    print(f"\n{'='*70}", flush=True)
+                    print(f"⚠️  Reached MAX_FILES limit ({self.config.max_files}) - stopping download", flush=True)
+                    print(f"{'='*70}", flush=True)
+                    break
             
-            queue_size = len(queue)
-            url = queue.pop(0)
+                # Keep the next files downloading while earlier ones are processed,
+                # without fetching past the file limit
+                prefetch_limit = self.MAX_WORKERS
+                if self.config.max_files:
+                    prefetch_limit = min(prefetch_limit, self.config.max_files - files_fetched)
+                self._prefetch(queue, prefetched, prefetch_limit)
+
+                queue_size = len(queue)
+                url = queue.popleft()
+                future = prefetched.pop(url, None)
             
-            # Skip fragment-only URLs (like #page, #section, etc.)
-            if url.startswith("#"):
-                continue
+                # Skip fragment-only URLs (like #page, #section, etc.)
+                if url.startswith("#"):
+                    continue
             
-            # Normalize URL for tracking (remove query strings to avoid downloading same file twice)
-            parsed_url = urlparse(url)
-            # Normalize www/non-www to avoid downloading same page twice
-            netloc_normalized = parsed_url.netloc.lower().lstrip("www.")
-            parsed_normalized = parsed_url._replace(netloc=netloc_normalized, fragment="", query="")
-            normalized_for_tracking = parsed_normalized.geturl()
-
-            if normalized_for_tracking in self.config.visited_urls:
-                files_skipped += 1
-                continue
+                # Normalize URL for tracking (remove query strings to avoid downloading same file twice)
+                normalized_for_tracking = _normalize_for_tracking(url)
 
-            # Show status
-            file_type = self._get_file_type_from_url(url)
-            current_file_num = len(self.config.visited_urls) + 1
-            limit_info = f" (limit: {self.config.max_files})" if self.config.max_files else ""
-            print(f"[{current_file_num}{limit_info}] Downloading {file_type}: {url}", flush=True)
-            if queue_size > 1:
-                print(f"         Queue: {queue_size - 1} files remaining", flush=True)
-            
-            self.config.visited_urls.add(normalized_for_tracking)
+                if normalized_for_tracking in self.config.visited_urls:
+                    if future is not None:
+                        future.cancel()
+                    files_skipped += 1
+                    continue
 
-            content = self.download_file(url)
-            if not content:
-                # Try CDN fallback for critical jQuery files if Wayback fails
-                if "jquery.min.js" in url.lower() and "cdn" not in url.lower():
-                    cdn_urls = [
-                        "https://code.jquery.com/jquery-3.7.1.min.js",
-                        "https://cdn.jsdelivr.net/npm/jquery@3.7.1/dist/jquery.min.js",
-                    ]
-                    for cdn_url in cdn_urls:
-                        try:
-                            print(f"         🔄 Trying CDN fallback: {cdn_url}", flush=True)
-                            cdn_response = self.session.get(cdn_url, timeout=10, allow_redirects=True)
-                            cdn_response.raise_for_status()
-                            content = cdn_response.content
-                            print(f"         ✓ Downloaded from CDN fallback", flush=True)
-                            break
-                        except:
-                            continue
-                
+                # Show status
+                file_type = self._get_file_type_from_url(url)
+                current_file_num = len(self.config.visited_urls) + 1
+                limit_info = f" (limit: {self.config.max_files})" if self.config.max_files else ""
+                self._log(f"[{current_file_num}{limit_info}] Downloading {file_type}: {url}")
+                if queue_size > 1:
+                    self._log(f"         Queue: {queue_size - 1} files remaining")
+            
+                self.config.visited_urls.add(normalized_for_tracking)
+
+                if future is not None:
+                    content, lines, fonts = future.result()
+                    # Apply the background fetch's output in queue order
+                    self.corrupted_fonts.update(fonts)
+                    for message, always in lines:
+                        self._log(message, always)
+                else:
+                    content = self.download_file(url)
                 if not content:
-                    files_failed += 1
-                    print(f"         ⚠️  Failed to download", flush=True)
-                    continue
+                    # Try CDN fallback for critical jQuery files if Wayback fails
+                    url_lower = url.lower()
+                    if "jquery.min.js" in url_lower and "cdn" not in url_lower:
+                        cdn_urls = [
+                            "https://code.jquery.com/jquery-3.7.1.min.js",
+                            "https://cdn.jsdelivr.net/npm/jquery@3.7.1/dist/jquery.min.js",
+                        ]
+                        for cdn_url in cdn_urls:
+                            try:
+                                self._log(f"         🔄 Trying CDN fallback: {cdn_url}")
+                                cdn_response = self.session.get(cdn_url, timeout=10, allow_redirects=True)
+                                cdn_response.raise_for_status()
+                                content = cdn_response.content
+                                self._log(f"         ✓ Downloaded from CDN fallback")
+                                break
+                            except:
+                                continue
+                
+                    if not content:
+                        files_failed += 1
+                        print(f"         ⚠️  Failed to download", flush=True)
+                        continue
             
-            # Show file size
-            size_kb = len(content) / 1024
-            if size_kb < 1024:
-                print(f"         ✓ Downloaded ({size_kb:.1f} KB)", flush=True)
-            else:
-                print(f"         ✓ Downloaded ({size_kb/1024:.1f} MB)", flush=True)
+                # Show file size
+                size_kb = len(content) / 1024
+                if size_kb < 1024:
+                    self._log(f"         ✓ Downloaded ({size_kb:.1f} KB)")
+                else:
+                    self._log(f"         ✓ Downloaded ({size_kb/1024:.1f} MB)")
             
-            files_downloaded += 1
+                files_fetched += 1
+                if progress is not None:
+                    progress.update()
 
-            # Determine file type with robust detection
-            try:
-                parsed = urlparse(url)
-                content_type, _ = mimetypes.guess_type(parsed.path)
+                # Determine file type with robust detection
+                try:
+                    parsed = _urlparse(url)
+                    content_type, _ = mimetypes.guess_type(parsed.path)
                 
-                # Better content type detection from URL path
-                # Check for Google Fonts CSS files first (they don't have .css extension)
-                if "fonts.googleapis.com" in url and "/css" in url:
-                    content_type = "text/css"
-                elif not content_type:
-                    path_lower = parsed.path.lower()
-                    # Check for specific extensions
-                    if path_lower.endswith(".css") or "/.css" in path_lower:
+                    # Better content type detection from URL path
+                    # Check for Google Fonts CSS files first (they don't have .css extension)
+                    if "fonts.googleapis.com" in url and "/css" in url:
                         content_type = "text/css"
-                    elif path_lower.endswith((".js", ".mjs")) or "/.js" in path_lower:
-                        content_type = "application/javascript"
-                    elif any(path_lower.endswith(ext) for ext in [".woff", ".woff2", ".ttf", ".eot", ".otf"]):
-                        content_type = "font/woff2"  # Font file
-                    elif any(path_lower.endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".bmp", ".tiff"]):
-                        content_type = "image/jpeg"  # Default, will be refined from actual content
-                    elif path_lower.endswith(".json"):
-                        content_type = "application/json"
-                    elif path_lower.endswith(".xml"):
-                        content_type = "application/xml"
-                    elif path_lower.endswith(".pdf"):
-                        content_type = "application/pdf"
-                    elif any(path_lower.endswith(ext) for ext in [".mp4", ".webm", ".ogg"]):
-                        content_type = "video/mp4"
-                    elif any(path_lower.endswith(ext) for ext in [".mp3", ".wav", ".ogg"]):
-                        content_type = "audio/mpeg"
+                    elif not content_type:
+                        path_lower = parsed.path.lower()
+                        ext = os.path.splitext(path_lower)[1]
+                        if not ext:
+                            # splitext sees no extension in bare dot-names such
+                            # as "/assets/.css"; take the part after the last dot
+                            name = posixpath.basename(path_lower)
+                            if name.startswith("."):
+                                ext = name[name.rfind("."):]
+                        # Check for specific extensions. A ".css" or ".js" path
+                        # segment (e.g. "/.js/app") also marks the file type
+                        if ext == ".css" or "/.css" in path_lower:
+                            content_type = "text/css"
+                        elif ext in (".js", ".mjs") or "/.js" in path_lower:
+                            content_type = "application/javascript"
+                        else:
+                            content_type = _EXT_TO_CT.get(ext)
                 
-                # Try to detect from actual content if still unknown
-                if not content_type and len(content) > 0:
-                    content_stripped = content.lstrip()
-                    if content_stripped.startswith((b'<!DOCTYPE', b'<!doctype', b'<html', b'<HTML')):
-                        content_type = "text/html"
-                    elif content_stripped.startswith((b'/*', b'@charset')) or b'@media' in content[:200]:
-                        content_type = "text/css"
-                    elif content_stripped.startswith(b'<?xml') or b'<svg' in content[:200]:
-                        content_type = "image/svg+xml"
-                    elif content.startswith(b'\x89PNG'):
-                        content_type = "image/png"
-                    elif content.startswith(b'\xff\xd8\xff'):
-                        content_type = "image/jpeg"
-                    elif content.startswith(b'GIF'):
-                        content_type = "image/gif"
-                    elif content.startswith(b'RIFF') and b'WEBP' in content[:12]:
-                        content_type = "image/webp"
-            except Exception as e:
-                print(f"Warning: Error detecting content type for {url}: {e}")
-                content_type = None
+                    # Try to detect from actual content if still unknown
+                    if not content_type and len(content) > 0:
+                        # Offset of the first non-whitespace byte, without copying the content
+                        start = _RE_LEADING_WS.match(content).end()
+                        if content.startswith((b'<!DOCTYPE', b'<!doctype', b'<html', b'<HTML'), start):
+                            content_type = "text/html"
+                        elif content.startswith((b'/*', b'@charset'), start) or b'@media' in content[:200]:
+                            content_type = "text/css"
+                        elif content.startswith(b'<?xml', start) or b'<svg' in content[:200]:
+                            content_type = "image/svg+xml"
+                        elif content.startswith(b'RIFF') and b'WEBP' in content[:12]:
+                            content_type = "image/webp"
+                        else:
+                            for signature, sniffed_type in _IMAGE_SIGNATURES:
+                                if content.startswith(signature):
+                                    content_type = sniffed_type
+                                    break
+                except Exception as e:
+                    print(f"Warning: Error detecting content type for {url}: {e}")
+                    content_type = None
             
-            # Use normalized URL (without query strings) for file paths
-            # Exception: For Google Fonts CSS files, preserve query string in path for uniqueness
-            if "fonts.googleapis.com" in url and "/css" in url:
-                # For Google Fonts CSS, use query string hash to create unique filename
-                import hashlib
-                parsed_original = urlparse(url)
-                query_hash = hashlib.md5(parsed_original.query.encode()).hexdigest()[:8]
-                font_path = f"fonts.googleapis.com/css-{query_hash}.css"
-                local_path = self._get_local_path(f"http://{font_path}")
-            else:
-                local_path = self._get_local_path(normalized_for_tracking)
-            local_path.parent.mkdir(parents=True, exist_ok=True)
+                # Use normalized URL (without query strings) for file paths
+                # Exception: For Google Fonts CSS files, preserve query string in path for uniqueness
+                if "fonts.googleapis.com" in url and "/css" in url:
+                    # For Google Fonts CSS, use query string hash to create unique filename
+                    parsed_original = _urlparse(url)
+                    query_hash = _short_hash(parsed_original.query)
+                    font_path = f"fonts.googleapis.com/css-{query_hash}.css"
+                    local_path = self._get_local_path(f"http://{font_path}")
+                else:
+                    local_path = self._get_local_path(normalized_for_tracking)
+                self._ensure_dir(local_path.parent)
             
-            try:
-                # Check for Google Fonts CSS files first (they don't have .css extension)
-                is_google_fonts_css = "fonts.googleapis.com" in url and "/css" in url
+                try:
+                    # Check for Google Fonts CSS files first (they don't have .css extension)
+                    is_google_fonts_css = "fonts.googleapis.com" in url and "/css" in url
                 
-                # Process based on content type - be more conservative about what we treat as HTML
-                is_html = (
-                    not is_google_fonts_css and (
-                        content_type == "text/html" or
-                        (not content_type and self._is_html_url(url, parsed))
+                    # Process based on content type - be more conservative about what we treat as HTML
+                    is_html = (
+                        not is_google_fonts_css and (
+                            content_type == "text/html" or
+                            (not content_type and self._is_html_url(url, parsed))
+                        )
                     )
-                )
                 
-                if is_html:
-                    # Process HTML
-                    try:
-                        print(f"         Processing HTML and extracting links...", flush=True)
-                        # Try to decode as UTF-8, fallback to latin-1 or detect encoding
+                    if is_html:
+                        # Process HTML
                         try:
-                            html = content.decode("utf-8", errors="strict")
-                        except UnicodeDecodeError:
-                            try:
-                                html = content.decode("utf-8", errors="ignore")
-                            except Exception:
-                                # Last resort: try latin-1 which can decode any byte sequence
-                                html = content.decode("latin-1", errors="ignore")
+                            self._log(f"         Processing HTML and extracting links...")
+                            # Decode as UTF-8 in a single pass, dropping invalid bytes
+                            html = content.decode("utf-8", errors="ignore")
                         
-                        processed_html, new_links = self._process_html(html, url)
-                        if new_links:
-                            print(f"         Found {len(new_links)} new links to download", flush=True)
-                    except Exception as e:
-                        print(f"Error processing HTML for {url}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        # Still save the raw HTML if processing fails
+                            processed_html, new_links = self._process_html(html, url)
+                            if new_links:
+                                self._log(f"         Found {len(new_links)} new links to download")
+                        except Exception as e:
+                            print(f"Error processing HTML for {url}: {e}")
+                            traceback.print_exc()
+                            # Still save the raw HTML if processing fails
+                            try:
+                                local_path.write_bytes(content)
+                                self.config.downloaded_files[url] = str(local_path)
+                            except Exception as save_error:
+                                print(f"Error saving file {local_path}: {save_error}")
+                            continue
+
+                        # Save HTML
                         try:
-                            with open(local_path, "wb") as f:
-                                f.write(content)
+                            local_path.write_bytes(processed_html.encode("utf-8", errors="replace"))
                             self.config.downloaded_files[url] = str(local_path)
-                        except Exception as save_error:
-                            print(f"Error saving file {local_path}: {save_error}")
-                        continue
-
-                    # Save HTML
-                    try:
-                        with open(local_path, "w", encoding="utf-8", errors="replace") as f:
-                            f.write(processed_html)
-                        self.config.downloaded_files[url] = str(local_path)
-                    except Exception as e:
-                        print(f"Error saving HTML to {local_path}: {e}")
-                        continue
+                        except Exception as e:
+                            print(f"Error saving HTML to {local_path}: {e}")
+                            continue
 
-                    # Add new links to queue (deduplicate)
-                    for link_url in new_links:
-                        # Normalize for tracking (to avoid downloading same file multiple times)
-                        parsed_link = urlparse(link_url)
-                        normalized_link = parsed_link._replace(fragment="", query="").geturl()
-                        if normalized_link not in self.config.visited_urls:
-                            # Check if already in queue (normalize queue items too)
-                            in_queue = False
-                            for q_url in queue:
-                                parsed_q = urlparse(q_url)
-                                normalized_q = parsed_q._replace(fragment="", query="").geturl()
-                                if normalized_q == normalized_link:
-                                    in_queue = True
-                                    break
-                            if not in_queue:
+                        # Add new links to queue (deduplicate)
+                        for link_url in new_links:
+                            # Normalize for tracking (to avoid downloading same file multiple times)
+                            normalized_link = _strip_query(link_url)
+                            if normalized_link not in self.config.visited_urls and normalized_link not in queued:
+                                queued.add(normalized_link)
                                 queue.append(link_url)
 
-                elif content_type == "text/css":
-                    # Process CSS
-                    try:
-                        css = content.decode("utf-8", errors="ignore")
-                    except Exception:
-                        css = content.decode("latin-1", errors="ignore")
+                    elif content_type == "text/css":
+                        # Process CSS
+                        css = original_css = content.decode("utf-8", errors="ignore")
                     
-                    try:
-                        print(f"         Processing CSS and extracting resources...", flush=True)
-                        # Extract URLs from CSS (images, fonts, @import, etc.)
-                        css_urls = self._extract_css_urls(css, url)
-                        if css_urls:
-                            print(f"         Found {len(css_urls)} resources in CSS", flush=True)
-                        for css_url in css_urls:
-                            # Normalize for tracking
-                            parsed_css = urlparse(css_url)
-                            normalized_css = parsed_css._replace(fragment="", query="").geturl()
-                            # Handle fonts.gstatic.com URLs - these are external but available on Wayback Machine
-                            # They need to be downloaded to avoid CORS issues
-                            is_google_font = "fonts.gstatic.com" in css_url or "fonts.googleapis.com" in css_url
-                            is_squarespace_cdn = self._is_squarespace_cdn(css_url)
-                            if normalized_css not in self.config.visited_urls and (self._is_internal_url(css_url) or is_google_font or is_squarespace_cdn):
-                                # Check if already in queue
-                                in_queue = False
-                                for q_url in queue:
-                                    parsed_q = urlparse(q_url)
-                                    normalized_q = parsed_q._replace(fragment="", query="").geturl()
-                                    if normalized_q == normalized_css:
-                                        in_queue = True
-                                        break
-                                if not in_queue:
-                                    queue.append(css_url)
-                                    if is_google_font:
-                                        print(f"         📥 Queued Google Font file for download: {css_url[:80]}...", flush=True)
+                        try:
+                            self._log(f"         Processing CSS and extracting resources...")
+                            # Extract URLs from CSS (images, fonts, @import, etc.)
+                            css_urls = self._extract_css_urls(css, url)
+                            if css_urls:
+                                self._log(f"         Found {len(css_urls)} resources in CSS")
+                            for css_url in css_urls:
+                                # Normalize for tracking
+                                normalized_css = _strip_query(css_url)
+                                # Handle fonts.gstatic.com URLs - these are external but available on Wayback Machine
+                                # They need to be downloaded to avoid CORS issues
+                                is_google_font = "fonts.gstatic.com" in css_url or "fonts.googleapis.com" in css_url
+                                is_squarespace_cdn = self._is_squarespace_cdn(css_url)
+                                if normalized_css not in self.config.visited_urls and (self._is_internal_url(css_url) or is_google_font or is_squarespace_cdn):
+                                    if normalized_css not in queued:
+                                        queued.add(normalized_css)
+                                        queue.append(css_url)
+                                        if is_google_font:
+                                            self._log(f"         📥 Queued Google Font file for download: {css_url[:80]}...")
                         
-                        # Rewrite URLs in CSS to relative paths
-                        css = self._rewrite_css_urls(css, url)
+                            # Rewrite URLs in CSS to relative paths
+                            css = self._rewrite_css_urls(css, url)
                         
-                        # Check font URLs in CSS and detect corrupted ones proactively
-                        # This ensures we catch corrupted fonts even if they haven't been downloaded yet
-                        css = self._check_and_remove_corrupted_fonts_in_css(css, url)
+                            # Check font URLs in CSS and detect corrupted ones proactively
+                            # This ensures we catch corrupted fonts even if they haven't been downloaded yet
+                            css = self._check_and_remove_corrupted_fonts_in_css(css, url)
                         
-                        # Remove references to already-detected corrupted fonts
-                        css = self._remove_corrupted_fonts_from_css(css)
+                            # Remove references to already-detected corrupted fonts
+                            css = self._remove_corrupted_fonts_from_css(css)
                         
-                        # Proactively remove .eot and .svg font format references
-                        # These are often corrupted (HTML error pages) and modern browsers don't need them
-                        # Browsers will use .woff2, .woff, and .ttf which are more reliable
-                        css = self._remove_legacy_font_formats_from_css(css)
+                            # Proactively remove .eot and .svg font format references
+                            # These are often corrupted (HTML error pages) and modern browsers don't need them
+                            # Browsers will use .woff2, .woff, and .ttf which are more reliable
+                            css = self._remove_legacy_font_formats_from_css(css)
                         
-                        css = self._minify_css(css)
-                    except Exception as e:
-                        print(f"Warning: Error processing CSS for {url}: {e}")
-                        # Use original content if processing fails
-                        css = content.decode("utf-8", errors="ignore")
+                            css = self._minify_css(css)
+                        except Exception as e:
+                            print(f"Warning: Error processing CSS for {url}: {e}")
+                            # Use original content if processing fails
+                            css = original_css
 
-                    try:
-                        with open(local_path, "w", encoding="utf-8", errors="replace") as f:
-                            f.write(css)
-                        self.config.downloaded_files[url] = str(local_path)
-                    except Exception as e:
-                        print(f"Error saving CSS to {local_path}: {e}")
-                        continue
+                        try:
+                            local_path.write_bytes(css.encode("utf-8", errors="replace"))
+                            self.config.downloaded_files[url] = str(local_path)
+                        except Exception as e:
+                            print(f"Error saving CSS to {local_path}: {e}")
+                            continue
 
-                elif content_type in ("application/javascript", "text/javascript"):
-                    # Process JavaScript
-                    js = content.decode("utf-8", errors="ignore")
+                    elif content_type in ("application/javascript", "text/javascript"):
+                        # Process JavaScript
+                        js = content.decode("utf-8", errors="ignore")
                     
-                    print(f"         Processing JavaScript and extracting URLs...", flush=True)
-                    # Extract URLs from JavaScript (may contain fetch, XMLHttpRequest, etc.)
-                    js_urls = self._extract_js_urls(js, url)
-                    if js_urls:
-                        print(f"         Found {len(js_urls)} URLs in JavaScript", flush=True)
-                    for js_url in js_urls:
-                        # Normalize for tracking
-                        parsed_js = urlparse(js_url)
-                        normalized_js = parsed_js._replace(fragment="", query="").geturl()
-                        if normalized_js not in self.config.visited_urls and self._is_internal_url(js_url):
-                            # Check if already in queue
-                            in_queue = False
-                            for q_url in queue:
-                                parsed_q = urlparse(q_url)
-                                normalized_q = parsed_q._replace(fragment="", query="").geturl()
-                                if normalized_q == normalized_js:
-                                    in_queue = True
-                                    break
-                            if not in_queue:
+                        self._log(f"         Processing JavaScript and extracting URLs...")
+                        # Extract URLs from JavaScript (may contain fetch, XMLHttpRequest, etc.)
+                        js_urls = self._extract_js_urls(js, url)
+                        if js_urls:
+                            self._log(f"         Found {len(js_urls)} URLs in JavaScript")
+                        for js_url in js_urls:
+                            # Normalize for tracking
+                            normalized_js = _strip_query(js_url)
+                            if normalized_js not in self.config.visited_urls and normalized_js not in queued and self._is_internal_url(js_url):
+                                queued.add(normalized_js)
                                 queue.append(js_url)
                     
-                    js = self._minify_js(js)
+                        js = self._minify_js(js)
 
-                    with open(local_path, "w", encoding="utf-8") as f:
-                        f.write(js)
+                        local_path.write_bytes(js.encode("utf-8"))
 
-                    self.config.downloaded_files[url] = str(local_path)
+                        self.config.downloaded_files[url] = str(local_path)
 
-                elif content_type and content_type.startswith("image/"):
-                    # Process images
-                    format_map = {
-                        "image/jpeg": "JPEG",
-                        "image/png": "PNG",
-                        "image/gif": "GIF",
-                        "image/webp": "WEBP",
-                    }
-                    img_format = format_map.get(content_type, "JPEG")
-                    optimized = self._optimize_image(content, img_format)
+                    elif content_type and content_type.startswith("image/"):
+                        # Process images
+                        format_map = {
+                            "image/jpeg": "JPEG",
+                            "image/png": "PNG",
+                            "image/gif": "GIF",
+                            "image/webp": "WEBP",
+                        }
+                        img_format = format_map.get(content_type, "JPEG")
+                        if self.config.optimize_images:
+                            # Re-encoding is CPU-bound; do it in worker processes
+                            self._submit_image(url, local_path, content, img_format)
+                            continue
 
-                    with open(local_path, "wb") as f:
-                        f.write(optimized)
+                        local_path.write_bytes(content)
 
-                    self.config.downloaded_files[url] = str(local_path)
+                        self.config.downloaded_files[url] = str(local_path)
 
-                elif content_type and content_type.startswith("font/"):
-                    # Save font files as-is
-                    with open(local_path, "wb") as f:
-                        f.write(content)
-                    self.config.downloaded_files[url] = str(local_path)
+                    elif content_type and content_type.startswith("font/"):
+                        # Save font files as-is
+                        local_path.write_bytes(content)
+                        self.config.downloaded_files[url] = str(local_path)
 
-                else:
-                    # Save as-is
-                    with open(local_path, "wb") as f:
-                        f.write(content)
+                    else:
+                        # Save as-is
+                        local_path.write_bytes(content)
 
-                    self.config.downloaded_files[url] = str(local_path)
-            except Exception as e:
-                print(f"Error processing {url}: {e}")
-                continue
+                        self.config.downloaded_files[url] = str(local_path)
+                except Exception as e:
+                    print(f"Error processing {url}: {e}")
+                    continue
+        finally:
+            # Runs on errors and Ctrl+C too, so submitted images are still
+            # written and no worker threads or processes are left behind
+            self._shutdown_download_pool(prefetched)
+            self._shutdown_image_pool()
+            self._shutdown_executor()
+            if progress is not None:
+                progress.close()
+
+        # Only files whose bytes reached the disk count as downloaded; deferred
+        # image writes have finished by now
+        files_downloaded = len(self.config.downloaded_files) - files_saved_before
 
         print(f"\n{'='*70}", flush=True)
         print(f"Download Complete!", flush=True)